@@ -0,0 +1,77 @@
+"""Сериализация постов и комментариев для API.
+
+Клиент выбирает поля параметром fields (sparse fieldsets): в ответ
+попадают только они, а из базы читаются только нужные для них колонки
+и связанные таблицы.
+"""
+from collections import namedtuple
+
+Field = namedtuple('Field', 'value columns related')
+
+POST_FIELDS = {
+    'id': Field(lambda post: post.id, (), ()),
+    'text': Field(lambda post: post.text, ('text',), ()),
+    'pub_date': Field(lambda post: post.pub_date.isoformat(), (), ()),
+    'author': Field(
+        lambda post: post.author.username,
+        ('author', 'author__username'),
+        ('author',),
+    ),
+    'group': Field(
+        lambda post: post.group.slug if post.group_id else None,
+        ('group', 'group__slug'),
+        ('group',),
+    ),
+    'image': Field(
+        lambda post: post.image.url if post.image else None,
+        ('image',),
+        (),
+    ),
+    'comments_count': Field(
+        lambda post: post.comments_count, ('comments_count',), ()
+    ),
+}
+
+COMMENT_FIELDS = {
+    'id': Field(lambda comment: comment.id, (), ()),
+    'author': Field(
+        lambda comment: comment.author.username,
+        ('author', 'author__username'),
+        ('author',),
+    ),
+    'text': Field(lambda comment: comment.text, ('text',), ()),
+    'created': Field(lambda comment: comment.created.isoformat(), (), ()),
+}
+
+
+def parse_fields(value, available):
+    """Список полей из параметра fields. Пустой параметр - все поля,
+    неизвестное поле - ValueError."""
+    if not value:
+        return list(available)
+    fields = list(dict.fromkeys(
+        name.strip() for name in value.split(',') if name.strip()
+    ))
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ValueError(f'Неизвестные поля: {", ".join(unknown)}.')
+    return fields
+
+
+def restrict(queryset, fields, available, ordering):
+    """Ограничивает queryset колонками и связями выбранных полей.
+
+    Поля сортировки ordering нужны для курсора и читаются всегда.
+    """
+    columns = ['id', *(field.lstrip('-') for field in ordering)]
+    related = []
+    for name in fields:
+        columns.extend(available[name].columns)
+        related.extend(available[name].related)
+    return queryset.select_related(None).select_related(*related).only(
+        *dict.fromkeys(columns)
+    )
+
+
+def serialize(obj, fields, available):
+    return {name: available[name].value(obj) for name in fields}
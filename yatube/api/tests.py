@@ -0,0 +1,107 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.posts = [
+            Post.objects.create(
+                author=self.author, group=self.group, text=f'Пост {number}'
+            )
+            for number in range(5)
+        ]
+        self.client.force_login(self.reader)
+
+    def test_feeds_with_cursor_and_fields(self):
+        """Проверяем курсорную пагинацию и выбор полей в лентах."""
+        urls = (
+            reverse('api:posts'),
+            reverse('api:group_posts', args=(self.group.slug,)),
+            reverse('api:profile_posts', args=(self.author.username,)),
+        )
+        expected = [post.id for post in reversed(self.posts)]
+        for url in urls:
+            with self.subTest(url=url):
+                ids = []
+                params = {'fields': 'id,author', 'limit': 2}
+                while True:
+                    data = self.client.get(url, params).json()
+                    for item in data['results']:
+                        self.assertEqual(set(item), {'id', 'author'})
+                        ids.append(item['id'])
+                    if data['next'] is None:
+                        break
+                    params['after'] = data['next']
+                self.assertEqual(ids, expected)
+
+    def test_post_detail_and_comments(self):
+        post = self.posts[0]
+        Comment.objects.create(post=post, author=self.reader, text='Ого')
+        data = self.client.get(
+            reverse('api:post_detail', args=(post.id,))
+        ).json()
+        self.assertEqual(data['text'], post.text)
+        self.assertEqual(data['group'], self.group.slug)
+        self.assertEqual(data['comments_count'], 1)
+        comments = self.client.get(
+            reverse('api:comments', args=(post.id,)), {'fields': 'text'}
+        ).json()
+        self.assertEqual(comments['results'], [{'text': 'Ого'}])
+
+    def test_errors(self):
+        """Проверяем, что ошибки отдаются в JSON."""
+        cases = (
+            (reverse('api:posts'), {'fields': 'id,password'},
+             HTTPStatus.BAD_REQUEST),
+            (reverse('api:post_detail', args=(0,)), {},
+             HTTPStatus.NOT_FOUND),
+            (reverse('api:group_posts', args=('missing',)), {},
+             HTTPStatus.NOT_FOUND),
+        )
+        for url, params, status in cases:
+            with self.subTest(url=url):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
+        self.client.logout()
+        response = self.client.get(reverse('api:follow_posts'))
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_etag(self):
+        """Проверяем, что неизменная лента отдает 304 без запросов
+        к постам, а новый пост меняет ETag."""
+        url = reverse('api:posts')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_follow_and_follow_feed(self):
+        url = reverse('api:follow', args=(self.author.username,))
+        self.assertEqual(self.client.post(url).status_code,
+                         HTTPStatus.CREATED)
+        self.assertEqual(self.client.post(url).status_code, HTTPStatus.OK)
+        data = self.client.get(reverse('api:follow_posts')).json()
+        self.assertEqual(len(data['results']), len(self.posts))
+        self.assertEqual(self.client.delete(url).status_code,
+                         HTTPStatus.NO_CONTENT)
+        self.assertFalse(Follow.objects.exists())
+        response = self.client.post(
+            reverse('api:follow', args=(self.reader.username,))
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
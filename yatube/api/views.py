@@ -0,0 +1,201 @@
+"""JSON API v1 для мобильных клиентов.
+
+View-функции читают те же выборки, что и HTML-страницы (posts.feeds),
+отдают страницы курсорной пагинации и только запрошенные поля.
+ETag ответа считается по версиям лент из posts.feed_cache до чтения
+данных, поэтому повторный запрос без изменений получает 304 без
+SQL-запросов к самой ленте.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition, require_http_methods
+
+from posts import feed_cache, feeds, follow_graph
+from posts.models import Group, Post, User
+from posts.utils import CursorPaginator
+
+from .serializers import (
+    COMMENT_FIELDS, POST_FIELDS, parse_fields, restrict, serialize,
+)
+
+POST_ORDERING = ('-pub_date', '-id')
+COMMENT_ORDERING = ('-created', '-id')
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def api_response(data, status=200):
+    return JsonResponse(
+        data,
+        status=status,
+        json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False},
+    )
+
+
+def api_view(view):
+    """Отдает ошибки API и 404 в виде JSON, а не HTML-страницы."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            return api_response({'detail': error.message}, error.status)
+        except Http404:
+            return api_response({'detail': 'Не найдено.'}, 404)
+    return wrapper
+
+
+def login_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            raise ApiError('Нужна авторизация.', 401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def feed_etag(request, *scope):
+    """ETag ответа по версии ленты scope. Ответы публичных лент не
+    зависят от пользователя, поэтому сессия для ETag не читается."""
+    return feed_cache.etag(request, scope)
+
+
+def list_etag(request, *scope):
+    """ETag списка постов: в нем еще и счетчики комментариев, которые
+    не меняют версию ленты."""
+    return feed_cache.etag(request, scope, feed_cache.COMMENTS)
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', settings.POSTS_PER_PAGE))
+    except ValueError:
+        raise ApiError('limit должен быть числом.')
+    return max(1, min(size, settings.API_MAX_PAGE_SIZE))
+
+
+def fields_of(request, available):
+    try:
+        return parse_fields(request.GET.get('fields'), available)
+    except ValueError as error:
+        raise ApiError(str(error))
+
+
+def page_response(request, queryset, available, ordering):
+    fields = fields_of(request, available)
+    page_obj = CursorPaginator(
+        restrict(queryset, fields, available, ordering),
+        page_size(request),
+        ordering=ordering,
+    ).get_page(request.GET.get('after'), request.GET.get('before'))
+    return api_response({
+        'results': [serialize(obj, fields, available) for obj in page_obj],
+        'next': page_obj.next_cursor,
+        'previous': page_obj.previous_cursor,
+    })
+
+
+def posts_response(request, queryset):
+    return page_response(request, queryset, POST_FIELDS, POST_ORDERING)
+
+
+def _group_etag(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'id', flat=True
+    ).first()
+    return list_etag(request, 'group', group_id) if group_id else None
+
+
+def _profile_etag(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'id', flat=True
+    ).first()
+    return (
+        list_etag(request, 'profile', author_id) if author_id else None
+    )
+
+
+@require_http_methods(['GET', 'HEAD'])
+@condition(etag_func=lambda request: list_etag(request, 'index'))
+@api_view
+def posts(request):
+    return posts_response(request, feeds.index_posts())
+
+
+@require_http_methods(['GET', 'HEAD'])
+@condition(etag_func=lambda request, post_id: feed_etag(
+    request, 'post', post_id
+))
+@api_view
+def post_detail(request, post_id):
+    fields = fields_of(request, POST_FIELDS)
+    post = get_object_or_404(
+        restrict(feeds.index_posts(), fields, POST_FIELDS, POST_ORDERING),
+        id=post_id,
+    )
+    return api_response(serialize(post, fields, POST_FIELDS))
+
+
+@require_http_methods(['GET', 'HEAD'])
+@condition(etag_func=_group_etag)
+@api_view
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return posts_response(request, feeds.group_posts_list(group))
+
+
+@require_http_methods(['GET', 'HEAD'])
+@condition(etag_func=_profile_etag)
+@api_view
+def profile_posts(request, username):
+    author = get_object_or_404(User, username=username)
+    return posts_response(request, feeds.profile_posts(author))
+
+
+# Лента подписок меняется с постами и комментариями всех авторов
+# читателя, поэтому она отдается без ETag.
+@require_http_methods(['GET', 'HEAD'])
+@api_view
+@login_required
+def follow_posts(request):
+    return posts_response(request, feeds.follow_posts(request.user))
+
+
+@require_http_methods(['GET', 'HEAD'])
+@condition(etag_func=lambda request, post_id: feed_etag(
+    request, 'post', post_id
+))
+@api_view
+def comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    return page_response(
+        request, feeds.post_comments(post), COMMENT_FIELDS, COMMENT_ORDERING
+    )
+
+
+@require_http_methods(['POST', 'DELETE'])
+@api_view
+@login_required
+@transaction.atomic
+def follow(request, username):
+    """POST подписывает на автора, DELETE отписывает."""
+    author = get_object_or_404(User, username=username)
+    if request.method == 'DELETE':
+        follow_graph.unfollow(request.user.id, author.id)
+        return HttpResponse(status=204)
+    if author.id == request.user.id:
+        raise ApiError('Нельзя подписаться на себя.')
+    created = follow_graph.follow(request.user.id, author.id)
+    return api_response(
+        {'author': author.username, 'following': True},
+        status=201 if created else 200,
+    )
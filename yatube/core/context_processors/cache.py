@@ -0,0 +1,8 @@
+from django.conf import settings
+
+
+def cache_timeouts(request):
+    return {
+        'feed_cache_ttl': settings.FEED_CACHE_TTL,
+        'post_card_cache_ttl': settings.POST_CARD_CACHE_TTL,
+    }
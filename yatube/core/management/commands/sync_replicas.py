@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную SQLite-базу в локальные реплики '
+            '(замена репликации для разработки).')
+
+    def handle(self, *args, **options):
+        if not settings.REPLICA_DATABASES:
+            raise CommandError(
+                'Реплики не настроены: задайте YATUBE_SQLITE_REPLICAS.'
+            )
+        aliases = ['default', *settings.REPLICA_DATABASES]
+        if any(connections[alias].vendor != 'sqlite' for alias in aliases):
+            raise CommandError('Команда работает только с SQLite.')
+        primary = connections['default']
+        primary.ensure_connection()
+        for alias in settings.REPLICA_DATABASES:
+            replica = connections[alias]
+            replica.close()
+            replica.ensure_connection()
+            primary.connection.backup(replica.connection)
+            replica.close()
+            self.stdout.write(f'{alias}: скопирована основная база.')
+        self.stdout.write(self.style.SUCCESS('Реплики синхронизированы.'))
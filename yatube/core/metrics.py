@@ -0,0 +1,205 @@
+"""Метрики запросов: число и время SQL-запросов, время рендеринга
+шаблонов, попадания в кэш и гистограммы по view-функциям.
+
+Метрики текущего запроса собирает core.middleware.RequestMetricsMiddleware.
+В Django 2.2 нет сигналов для рендеринга шаблонов и обращений к кэшу,
+поэтому install() оборачивает Template.render бэкенда шаблонов и
+методы get/get_many бэкендов кэша. Гистограммы хранятся в памяти
+процесса и отдаются view-функцией core.views.request_metrics.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.db import connections
+from django.template.backends.django import Template
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+current = ContextVar('request_metrics', default=None)
+_MISSING = object()
+_lock = threading.Lock()
+_installed = False
+_views = {}
+
+
+class RequestMetrics:
+    """Метрики одного запроса."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.total_time = 0.0
+
+    def server_timing(self):
+        """Значение заголовка Server-Timing (время в миллисекундах)."""
+        return ', '.join((
+            f'sql;dur={self.sql_time * 1000:.1f};'
+            f'desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ))
+
+
+class Histogram:
+    """Гистограмма с фиксированными верхними границами корзин."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def add(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def as_dict(self):
+        buckets = {
+            f'le_{bound}': count
+            for bound, count in zip(self.bounds, self.counts)
+        }
+        buckets['inf'] = self.counts[-1]
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 2),
+            'buckets': buckets,
+        }
+
+
+class ViewStats:
+    def __init__(self):
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.sql_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add(self, metrics):
+        self.latency_ms.add(metrics.total_time * 1000)
+        self.sql_ms.add(metrics.sql_time * 1000)
+        self.queries.add(metrics.queries)
+        self.cache_hits += metrics.cache_hits
+        self.cache_misses += metrics.cache_misses
+
+    def as_dict(self):
+        return {
+            'latency_ms': self.latency_ms.as_dict(),
+            'sql_ms': self.sql_ms.as_dict(),
+            'queries': self.queries.as_dict(),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+
+
+def _execute(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics = current.get()
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.sql_time += time.perf_counter() - started
+
+
+@contextmanager
+def collect():
+    """Собирает метрики кода внутри блока в RequestMetrics."""
+    metrics = RequestMetrics()
+    token = current.set(metrics)
+    started = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(_execute))
+            yield metrics
+    finally:
+        metrics.total_time = time.perf_counter() - started
+        current.reset(token)
+
+
+def record(view_name, metrics):
+    """Добавляет метрики запроса в гистограммы view-функции."""
+    with _lock:
+        stats = _views.get(view_name)
+        if stats is None:
+            stats = _views[view_name] = ViewStats()
+        stats.add(metrics)
+
+
+def snapshot():
+    with _lock:
+        return {name: stats.as_dict() for name, stats in _views.items()}
+
+
+def reset():
+    with _lock:
+        _views.clear()
+
+
+def _timed_render(render):
+    def wrapper(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            metrics = current.get()
+            if metrics is not None:
+                metrics.template_time += time.perf_counter() - started
+    return wrapper
+
+
+def _counted_get(get):
+    def wrapper(self, key, default=None, version=None):
+        value = get(self, key, _MISSING, version)
+        metrics = current.get()
+        if metrics is not None:
+            if value is _MISSING:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return default if value is _MISSING else value
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    def wrapper(self, keys, version=None):
+        keys = list(keys)
+        found = get_many(self, keys, version)
+        metrics = current.get()
+        if metrics is not None:
+            metrics.cache_hits += len(found)
+            metrics.cache_misses += len(keys) - len(found)
+        return found
+    return wrapper
+
+
+def install():
+    """Подключает подсчет времени шаблонов и обращений к кэшу.
+
+    Повторные вызовы ничего не делают.
+    """
+    global _installed
+    with _lock:
+        if _installed:
+            return
+        _installed = True
+    Template.render = _timed_render(Template.render)
+    backends = {type(caches[alias]) for alias in settings.CACHES}
+    for backend in backends:
+        backend.get = _counted_get(backend.get)
+        # BaseCache.get_many вызывает get, и ключи уже посчитаны.
+        if backend.get_many is not BaseCache.get_many:
+            backend.get_many = _counted_get_many(backend.get_many)
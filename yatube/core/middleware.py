@@ -0,0 +1,74 @@
+import logging
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics, routers
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """Считает SQL-запросы, время шаблонов и обращения к кэшу
+    для каждого запроса и отдает их в заголовке Server-Timing.
+
+    Запросы, в которых больше REQUEST_METRICS_QUERY_LIMIT SQL-запросов,
+    пишутся в лог: так сразу видны N+1 в шаблонах.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        metrics.install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with metrics.collect() as current:
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else '<unresolved>'
+        metrics.record(view_name, current)
+        response['Server-Timing'] = current.server_timing()
+        if current.queries > settings.REQUEST_METRICS_QUERY_LIMIT:
+            logger.warning(
+                '%s %s: %d SQL-запросов за %.1f мс',
+                request.method, view_name, current.queries,
+                current.sql_time * 1000,
+            )
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Отправляет чтение view-функций из REPLICA_READ_VIEWS на реплики.
+
+    После запроса, который писал в основную базу (новый пост,
+    комментарий, подписка), клиент получает cookie
+    REPLICA_STICKY_COOKIE, и следующие REPLICA_STICKY_SECONDS секунд
+    его запросы читают из основной базы: так автор сразу видит свою
+    запись, даже если реплика отстает.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routers.routing() as state:
+            response = self.get_response(request)
+        if state.wrote:
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS, httponly=True,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = routers.current.get()
+        state.use_replicas = (
+            not state.wrote
+            and request.method in ('GET', 'HEAD')
+            and request.resolver_match.view_name
+            in settings.REPLICA_READ_VIEWS
+            and settings.REPLICA_STICKY_COOKIE not in request.COOKIES
+        )
@@ -0,0 +1,112 @@
+"""Маршрутизация запросов к репликам базы данных.
+
+Запись всегда идет в основную базу (default). Чтение уходит на
+случайную исправную реплику, одну на весь запрос, только внутри
+view-функций из settings.REPLICA_READ_VIEWS (их отмечает
+ReplicaRoutingMiddleware) и только до первой записи в этом же
+запросе. Исправность реплики
+проверяется запросом SELECT 1 не чаще раза в
+REPLICA_HEALTH_CHECK_INTERVAL секунд; если исправных реплик нет,
+чтение идет из основной базы.
+"""
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# Сессии читаются сразу после записи (вход на сайт), их нельзя
+# читать с отстающей реплики.
+PRIMARY_ONLY_APPS = {'sessions'}
+
+current = ContextVar('db_routing', default=None)
+_lock = threading.Lock()
+_health = {}
+
+
+class RoutingState:
+    """Состояние маршрутизации одного HTTP-запроса."""
+
+    def __init__(self):
+        self.use_replicas = False
+        self.wrote = False
+        # Реплики отстают по-разному: все чтения запроса идут на одну,
+        # чтобы страница не смешивала их данные.
+        self.replica = None
+
+
+@contextmanager
+def routing():
+    state = RoutingState()
+    token = current.set(state)
+    try:
+        yield state
+    finally:
+        current.reset(token)
+
+
+def check(alias):
+    """Проверяет, что реплика alias отвечает на запросы."""
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except DatabaseError:
+        logger.warning('Реплика %s недоступна', alias, exc_info=True)
+        connections[alias].close()
+        return False
+    return True
+
+
+def healthy_replicas():
+    now = time.monotonic()
+    healthy = []
+    for alias in settings.REPLICA_DATABASES:
+        with _lock:
+            state = _health.get(alias)
+        if (
+            state is None
+            or now - state[1] > settings.REPLICA_HEALTH_CHECK_INTERVAL
+        ):
+            state = (check(alias), now)
+            with _lock:
+                _health[alias] = state
+        if state[0]:
+            healthy.append(alias)
+    return healthy
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = current.get()
+        if (
+            state is None
+            or not state.use_replicas
+            or model._meta.app_label in PRIMARY_ONLY_APPS
+        ):
+            return None
+        if state.replica is None:
+            replicas = healthy_replicas()
+            if not replicas:
+                return None
+            state.replica = random.choice(replicas)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = current.get()
+        if state is not None:
+            # Дальше в этом запросе читаем свои же записи.
+            state.wrote = True
+            state.use_replicas = False
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.REPLICA_DATABASES
@@ -1,6 +1,17 @@
+import time
 from http import HTTPStatus
+from unittest import mock
 
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import resolve, reverse
+
+from posts.models import Post
+from . import metrics, routers
+from .middleware import ReplicaRoutingMiddleware
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -8,3 +19,100 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class RequestMetricsTest(TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def test_server_timing_header(self):
+        """Проверяем, что ответ содержит метрики запроса."""
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for name in ('sql;dur=', 'queries', 'tpl;dur=', 'cache;desc=',
+                     'total;dur='):
+            with self.subTest(name=name):
+                self.assertIn(name, timing)
+        self.assertNotIn('desc="0 queries"', timing)
+
+    def test_metrics_endpoint(self):
+        """Проверяем, что гистограммы видны только персоналу."""
+        self.client.get(reverse('posts:index'))
+        url = reverse('core:request_metrics')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        admin = User.objects.create_user(username='admin', is_staff=True)
+        self.client.force_login(admin)
+        stats = self.client.get(url).json()['posts:index']
+        self.assertEqual(stats['latency_ms']['count'], 1)
+        self.assertGreater(stats['queries']['sum'], 0)
+
+
+@override_settings(REPLICA_DATABASES=['replica1'])
+class ReplicaRoutingTest(TestCase):
+    def setUp(self):
+        routers._health.clear()
+        routers._health['replica1'] = (True, time.monotonic())
+        self.router = routers.ReplicaRouter()
+
+    def route(self, path, method='get', cookies=None, write=False):
+        """Прогоняет запрос через middleware и возвращает базу, из
+        которой view-функция читала бы посты, и ответ."""
+        request = getattr(RequestFactory(), method)(path)
+        request.COOKIES.update(cookies or {})
+        request.resolver_match = resolve(path)
+        databases = []
+
+        def view(request):
+            middleware.process_view(request, None, (), {})
+            if write:
+                self.router.db_for_write(Post)
+            databases.append(self.router.db_for_read(Post))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(view)
+        response = middleware(request)
+        return databases[0], response
+
+    def test_read_views_use_replica(self):
+        """Проверяем, что ленты читаются с реплики, а остальное - нет."""
+        cases = {
+            reverse('posts:index'): 'replica1',
+            reverse('posts:follow_index'): 'replica1',
+            reverse('posts:post_create'): None,
+        }
+        for path, database in cases.items():
+            with self.subTest(path=path):
+                self.assertEqual(self.route(path)[0], database)
+        database, _ = self.route(reverse('posts:index'), method='post')
+        self.assertIsNone(database)
+
+    def test_read_your_writes(self):
+        """Проверяем, что после записи клиент читает из основной базы."""
+        path = reverse('posts:index')
+        database, response = self.route(path, write=True)
+        self.assertIsNone(database)
+        cookie = response.cookies['read_primary']
+        self.assertEqual(cookie['max-age'], 15)
+        database, _ = self.route(path, cookies={'read_primary': '1'})
+        self.assertIsNone(database)
+        self.assertNotIn('read_primary', self.route(path)[1].cookies)
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    @override_settings(REPLICA_DATABASES=['replica1', 'replica2'])
+    def test_one_replica_per_request(self):
+        """Проверяем, что все чтения запроса идут на одну реплику."""
+        routers._health['replica2'] = (True, time.monotonic())
+        for _ in range(10):
+            with routers.routing() as state:
+                state.use_replicas = True
+                databases = {self.router.db_for_read(Post) for _ in range(10)}
+            self.assertEqual(len(databases), 1)
+
+    def test_unhealthy_replica(self):
+        """Проверяем, что недоступная реплика не используется."""
+        routers._health.clear()
+        with mock.patch.object(routers, 'check', return_value=False) as check:
+            self.assertIsNone(self.route(reverse('posts:index'))[0])
+            self.route(reverse('posts:index'))
+        check.assert_called_once_with('replica1')
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search
 from .models import Comment, Group, Post
 
 
@@ -10,6 +11,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по поисковому индексу вместо icontains по тексту."""
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(pk__in=search.search_ids(search_term)), False
+
 
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('pk', 'post', 'text', 'created', 'author',)
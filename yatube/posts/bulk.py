@@ -0,0 +1,290 @@
+"""Пакетный импорт и экспорт постов, комментариев и подписок.
+
+Строки читаются и пишутся потоком в формате JSON Lines или CSV и
+сохраняются пачками через bulk_create, по транзакции на пачку. Авторы,
+группы и посты находятся по словарям, которые дозаполняются одним
+запросом на пачку. bulk_create не вызывает сигналы, поэтому счетчики,
+ленты подписок, кэш подписок, поисковый индекс и кэш лент обновляются
+здесь же.
+"""
+import csv
+import json
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters, feed_cache, follow_graph, search, timeline
+from .models import Comment, Follow, Group, Post, User
+
+FORMATS = ('jsonl', 'csv')
+KINDS = ('posts', 'comments', 'follows')
+
+EXPORT_FIELDS = {
+    'posts': ('id', 'author', 'group', 'text', 'pub_date', 'image'),
+    'comments': ('id', 'post', 'author', 'text', 'created'),
+    'follows': ('user', 'author'),
+}
+
+
+def export_rows(kind, chunk_size):
+    """Строки для экспорта: кортежи значений полей EXPORT_FIELDS[kind]."""
+    if kind == 'posts':
+        rows = Post.objects.order_by('id').values_list(
+            'id', 'author__username', 'group__slug', 'text', 'pub_date',
+            'image',
+        )
+    elif kind == 'comments':
+        rows = Comment.objects.order_by('id').values_list(
+            'id', 'post_id', 'author__username', 'text', 'created',
+        )
+    else:
+        rows = Follow.objects.order_by('id').values_list(
+            'user__username', 'author__username',
+        )
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield tuple(
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in row
+        )
+
+
+def write_rows(stream, format_, fields, rows):
+    """Пишет rows в stream, возвращает число строк."""
+    written = 0
+    if format_ == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow(row)
+            written += 1
+        return written
+    for row in rows:
+        line = json.dumps(dict(zip(fields, row)), ensure_ascii=False)
+        stream.write(line + '\n')
+        written += 1
+    return written
+
+
+def read_rows(stream, format_):
+    """Словари строк файла в формате format_."""
+    if format_ == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Lookup:
+    """Словарь «значение поля -> id», дозаполняемый одним запросом
+    на пачку строк."""
+
+    def __init__(self, queryset, field):
+        self.queryset = queryset
+        self.field = field
+        self.ids = {}
+
+    def load(self, keys):
+        missing = {key for key in keys if key and key not in self.ids}
+        if missing:
+            self.ids.update(
+                self.queryset.filter(
+                    **{f'{self.field}__in': missing}
+                ).values_list(self.field, 'id')
+            )
+
+    def get(self, key):
+        return self.ids.get(key)
+
+
+def _int(value):
+    return int(value) if value not in (None, '') else None
+
+
+def _datetime(value):
+    if not value:
+        return timezone.now()
+    value = parse_datetime(value)
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+@contextmanager
+def original_dates(*fields):
+    """Отключает auto_now и auto_now_add у полей, чтобы при импорте
+    сохранились даты из файла."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+class Importer:
+    """Импорт строк одного вида (posts, comments или follows).
+
+    Строки со ссылками на несуществующих пользователей, группы или
+    посты пропускаются. Уже существующие записи (с теми же id или
+    та же подписка) не перезаписываются.
+    """
+
+    def __init__(self, kind, batch_size):
+        self.kind = kind
+        self.batch_size = batch_size
+        self.users = Lookup(User.objects.all(), 'username')
+        self.groups = Lookup(Group.objects.all(), 'slug')
+        self.posts = Lookup(Post.objects.all(), 'id')
+        self.imported = 0
+        self.skipped = 0
+        self.user_ids = set()
+        self.author_ids = set()
+        self.follower_ids = set()
+
+    def build_post(self, row):
+        author_id = self.users.get(row['author'])
+        group_id = self.groups.get(row.get('group'))
+        if author_id is None or (row.get('group') and group_id is None):
+            return None
+        pub_date = _datetime(row.get('pub_date'))
+        return Post(
+            id=_int(row.get('id')),
+            author_id=author_id,
+            group_id=group_id,
+            text=row['text'],
+            image=row.get('image') or '',
+            pub_date=pub_date,
+            updated=pub_date,
+        )
+
+    def build_comment(self, row):
+        post_id = self.posts.get(_int(row['post']))
+        author_id = self.users.get(row['author'])
+        if post_id is None or author_id is None:
+            return None
+        return Comment(
+            id=_int(row.get('id')),
+            post_id=post_id,
+            author_id=author_id,
+            text=row['text'],
+            created=_datetime(row.get('created')),
+        )
+
+    def build_follow(self, row):
+        user_id = self.users.get(row['user'])
+        author_id = self.users.get(row['author'])
+        if user_id is None or author_id is None or user_id == author_id:
+            return None
+        return Follow(user_id=user_id, author_id=author_id)
+
+    def existing_keys(self, objects):
+        """Ключи объектов пачки, которые уже есть в базе. Разница до и
+        после bulk_create - строки, вставленные на самом деле:
+        ignore_conflicts молча пропускает существующие."""
+        if self.kind == 'follows':
+            pairs = {(follow.user_id, follow.author_id) for follow in objects}
+            found = Follow.objects.filter(
+                user_id__in={user_id for user_id, _ in pairs},
+                author_id__in={author_id for _, author_id in pairs},
+            ).values_list('user_id', 'author_id')
+            return pairs & set(found)
+        ids = {obj.id for obj in objects if obj.id}
+        return set(
+            type(objects[0]).objects.filter(id__in=ids).values_list(
+                'id', flat=True
+            )
+        )
+
+    def import_chunk(self, rows):
+        self.users.load(
+            row.get(field) for row in rows for field in ('author', 'user')
+        )
+        self.groups.load(row.get('group') for row in rows)
+        self.posts.load(_int(row.get('post')) for row in rows)
+        build = getattr(self, f'build_{self.kind[:-1]}')
+        objects = [obj for obj in map(build, rows) if obj is not None]
+        self.skipped += len(rows) - len(objects)
+        if not objects:
+            return
+        existing = self.existing_keys(objects)
+        if self.kind == 'posts':
+            top = Post.objects.aggregate(top=Max('id'))['top'] or 0
+        type(objects[0]).objects.bulk_create(
+            objects, batch_size=self.batch_size, ignore_conflicts=True
+        )
+        created = self.existing_keys(objects) - existing
+        if self.kind == 'posts':
+            # На SQLite bulk_create не возвращает id, поэтому новые
+            # посты без id из файла находятся по росту первичного ключа.
+            created.update(
+                Post.objects.filter(id__gt=top).exclude(
+                    id__in=existing
+                ).values_list('id', flat=True)
+            )
+            search.get_backend().index(
+                Post.objects.filter(id__in=created).only('id', 'text')
+            )
+            timeline.mark_not_fanned_out(created)
+            self.user_ids.update(post.author_id for post in objects)
+            self.author_ids.update(post.author_id for post in objects)
+            inserted = len(created)
+        elif self.kind == 'comments':
+            counters.recount_comments(
+                {comment.post_id for comment in objects}
+            )
+            # комментарии без id из файла вставляются всегда
+            inserted = len(created) + sum(not obj.id for obj in objects)
+        else:
+            condition = Q()
+            for user_id, author_id in created:
+                condition |= Q(user_id=user_id, author_id=author_id)
+                self.user_ids.update((user_id, author_id))
+                self.follower_ids.add(user_id)
+            if condition:
+                timeline.backfill_follows(Follow.objects.filter(condition))
+            inserted = len(created)
+        self.imported += inserted
+        self.skipped += len(objects) - inserted
+
+    def refresh(self):
+        """Пересчитывает счетчики и ленты подписок после импорта."""
+        user_ids = sorted(self.user_ids)
+        for batch in chunks(user_ids, self.batch_size):
+            counters.recount_user_stats(batch)
+        for batch in chunks(sorted(self.author_ids), self.batch_size):
+            timeline.backfill_follows(
+                Follow.objects.filter(author_id__in=batch)
+            )
+        for user_id in sorted(self.follower_ids):
+            follow_graph.invalidate(user_id)
+        feed_cache.bump(feed_cache.GLOBAL)
+
+    def run(self, rows):
+        with original_dates(
+            Post._meta.get_field('pub_date'),
+            Post._meta.get_field('updated'),
+            Comment._meta.get_field('created'),
+        ):
+            for chunk in chunks(rows, self.batch_size):
+                with transaction.atomic():
+                    self.import_chunk(chunk)
+        with transaction.atomic():
+            self.refresh()
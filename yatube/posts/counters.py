@@ -0,0 +1,80 @@
+"""Денормализованные счетчики постов, подписчиков и комментариев.
+
+Счетчики меняются одним UPDATE c F()-выражением в той же транзакции,
+что и изменение данных, поэтому параллельные запросы не теряют
+обновлений. Если счетчики все же разошлись с данными, их можно
+пересчитать командой recount_stats.
+"""
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, UserStats
+
+
+def change_user_stats(user_id, **deltas):
+    """Изменяет счетчики пользователя на deltas.
+
+    Строка статистики создается при первом увеличении счетчика;
+    уменьшение для отсутствующей строки (например, при каскадном
+    удалении пользователя) ничего не делает.
+    """
+    updates = {
+        field: F(field) + delta for field, delta in deltas.items()
+    }
+    updated = UserStats.objects.filter(user_id=user_id).update(**updates)
+    if updated or all(delta < 0 for delta in deltas.values()):
+        return
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id)], ignore_conflicts=True
+    )
+    UserStats.objects.filter(user_id=user_id).update(**updates)
+
+
+def change_comments_count(post_id, delta):
+    Post.objects.filter(id=post_id).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def _count(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        Value(0),
+    )
+
+
+def recount_user_stats(user_ids):
+    """Пересчитывает счетчики пользователей по данным таблиц."""
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=user_id) for user_id in user_ids),
+        ignore_conflicts=True,
+    )
+    UserStats.objects.filter(user_id__in=user_ids).update(
+        posts_count=_count(Post.objects.all(), 'author'),
+        followers_count=_count(Follow.objects.all(), 'author'),
+        following_count=_count(Follow.objects.all(), 'user'),
+    )
+
+
+def recount_comments(post_ids):
+    Post.objects.filter(id__in=post_ids).update(
+        comments_count=_count(Comment.objects.all(), 'post'),
+    )
+
+
+def id_batches(queryset, batch_size):
+    """Разбивает id объектов queryset на пачки по batch_size."""
+    ids = queryset.order_by('pk').values_list('pk', flat=True)
+    last_id = 0
+    while True:
+        batch = list(ids.filter(pk__gt=last_id)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
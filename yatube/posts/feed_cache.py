@@ -0,0 +1,111 @@
+"""Версионированные ключи кэша лент.
+
+Каждая лента (главная, группа, профиль, подписки, страница поста)
+хранит в кэше свой номер версии, который входит в ключи фрагментов
+шаблонов. При изменении данных версия увеличивается, и старые
+фрагменты просто перестают читаться, поэтому время жизни кэша можно
+делать большим. Если кэш не общий для процессов, версии живут
+FEED_VERSION_TTL секунд: другие процессы увидят изменения, когда
+версия истечет. Глобальная версия сбрасывает все ленты и карточки
+постов сразу (например, после переименования группы).
+
+При чтении с реплик рядом с версией хранится время ее повышения.
+Пока реплики могут отставать (REPLICA_STICKY_SECONDS), версия
+выдается с пометкой «не устоялась»: фрагменты и ETag, построенные по
+данным отстающей реплики, после этого срока перестают совпадать.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+GLOBAL = ('global',)
+# Счетчики комментариев всех карточек: меняется с каждым комментарием
+# и входит только в ETag списков, фрагменты карточек обновляет сам
+# счетчик в ключе.
+COMMENTS = ('comments',)
+KEY_PREFIX = 'feed_version'
+
+
+def version_key(scope):
+    return ':'.join(str(part) for part in (KEY_PREFIX, *scope))
+
+
+def new_version():
+    """Начальная версия зависит от времени, чтобы после вытеснения
+    ключа из кэша не совпасть с версией, выданной раньше."""
+    return int(time.time() * 1000)
+
+
+def bumped_key(key):
+    return f'{key}:bumped'
+
+
+def get_versions(*scopes):
+    keys = [version_key(scope) for scope in scopes]
+    if not settings.REPLICA_DATABASES:
+        versions = cache.get_many(keys)
+    else:
+        versions = cache.get_many(keys + [bumped_key(key) for key in keys])
+    missing = {key: new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, settings.FEED_VERSION_TTL)
+        versions.update(missing)
+    settled_after = time.time() - settings.REPLICA_STICKY_SECONDS
+    return [
+        versions[key]
+        if versions.get(bumped_key(key), 0) < settled_after
+        else f'{versions[key]}~'
+        for key in keys
+    ]
+
+
+def template_versions(*scope):
+    """Версии для тегов {% cache %} шаблона ленты scope."""
+    feed, common = get_versions(scope, GLOBAL)
+    return {
+        'feed_version': f'{feed}.{common}',
+        'cards_version': common,
+    }
+
+
+def etag(request, *scopes, user=False):
+    """ETag страницы по версиям лент scopes и карточек постов и адресу
+    с параметрами. user=True добавляет пользователя для страниц,
+    которые от него зависят, и CSRF-cookie, токен из которой попадает
+    в формы страницы."""
+    parts = [request.get_full_path(), *get_versions(*scopes, GLOBAL)]
+    if user:
+        parts.append(request.user.id)
+        parts.append(request.COOKIES.get(settings.CSRF_COOKIE_NAME))
+    return hashlib.md5('|'.join(map(str, parts)).encode()).hexdigest()
+
+
+def _bump(scopes):
+    keys = [version_key(scope) for scope in scopes]
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, new_version(), settings.FEED_VERSION_TTL)
+    if settings.REPLICA_DATABASES:
+        now = time.time()
+        cache.set_many(
+            {bumped_key(key): now for key in keys},
+            settings.FEED_VERSION_TTL,
+        )
+
+
+def bump(*scopes):
+    """Инвалидирует ленты scopes.
+
+    Внутри транзакции версия повышается еще раз после коммита: иначе
+    параллельный запрос мог бы закэшировать старые данные под новой
+    версией до того, как изменения станут видны. Время последнего
+    повышения отсчитывается от коммита.
+    """
+    _bump(scopes)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _bump(scopes))
@@ -0,0 +1,59 @@
+"""Запросы лент постов, общие для view-функций и служебных команд."""
+from django.conf import settings
+
+from .models import Group, Post
+from .timeline import timeline_posts
+from .utils import CursorPaginator
+
+
+def index_posts():
+    return Post.objects.select_related('author', 'group')
+
+
+def group_posts_list(group):
+    return group.posts.select_related('author', 'group')
+
+
+def profile_posts(author):
+    return author.posts.select_related('author', 'group')
+
+
+def follow_posts(user):
+    return timeline_posts(user).select_related('author', 'group')
+
+
+def trending_posts():
+    """Популярные посты из таблицы, заполненной materialize_trending."""
+    return Post.objects.filter(trending__isnull=False).select_related(
+        'author', 'group'
+    ).order_by('-trending__score', '-pub_date')
+
+
+def trending_groups():
+    return Group.objects.filter(trending__isnull=False).order_by(
+        '-trending__score'
+    )
+
+
+def posts_in_order(post_ids):
+    """Посты с id из post_ids в том же порядке (результаты поиска)."""
+    posts = index_posts().in_bulk(post_ids)
+    return [posts[post_id] for post_id in post_ids if post_id in posts]
+
+
+def post_with_author_stats():
+    """Посты вместе с автором, его счетчиками и группой."""
+    return Post.objects.select_related('author__stats', 'group')
+
+
+def post_comments(post):
+    return post.comments.select_related('author')
+
+
+def comments_paginator(post):
+    """Курсорный пагинатор комментариев поста, новые первыми."""
+    return CursorPaginator(
+        post_comments(post),
+        settings.COMMENTS_PER_PAGE,
+        ordering=('-created', '-id'),
+    )
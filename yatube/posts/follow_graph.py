@@ -0,0 +1,119 @@
+"""Граф подписок: на каких авторов подписан пользователь.
+
+Множество подписок пользователя читается из базы одним запросом и
+хранится в ограниченном LRU-кэше процесса. Актуальность записи
+проверяется по версии в общем кэше (posts.feed_cache), которую
+сигналы подписки и отписки повышают, поэтому изменения сразу видны
+и в других процессах.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from . import feed_cache
+from .models import Follow
+
+
+class LRUCache:
+    """Потокобезопасный словарь, вытесняющий давно не читанные ключи."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_following = LRUCache(settings.FOLLOW_GRAPH_CACHE_SIZE)
+
+
+def _scope(user_id):
+    return ('following', user_id)
+
+
+def following_ids(user_id):
+    """Id авторов, на которых подписан пользователь."""
+    if user_id is None:
+        return frozenset()
+    version, = feed_cache.get_versions(_scope(user_id))
+    cached = _following.get(user_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    author_ids = frozenset(
+        Follow.objects.filter(user_id=user_id).values_list(
+            'author_id', flat=True
+        )
+    )
+    _following.set(user_id, (version, author_ids))
+    return author_ids
+
+
+def is_following(user_id, author_id):
+    return author_id in following_ids(user_id)
+
+
+def follow(user_id, author_id):
+    """Подписывает пользователя на автора, возвращает True, если
+    подписки еще не было.
+
+    Подписка создается одним INSERT в точке сохранения: повторная или
+    параллельная подписка упирается в уникальное ограничение
+    (user, author) и ничего не меняет.
+    """
+    try:
+        with transaction.atomic():
+            Follow.objects.create(user_id=user_id, author_id=author_id)
+    except IntegrityError:
+        return False
+    return True
+
+
+def unfollow(user_id, author_id):
+    """Отписывает пользователя от автора, возвращает True, если
+    подписка была.
+
+    QuerySet.delete() шлет post_delete для всех найденных строк, даже
+    если их уже удалил параллельный запрос, и счетчики уменьшились бы
+    дважды. Поэтому строка подписки сначала блокируется: параллельная
+    отписка дождется коммита и подписки уже не найдет.
+    """
+    with transaction.atomic():
+        follow = Follow.objects.select_for_update().filter(
+            user_id=user_id, author_id=author_id
+        ).first()
+        if follow is None:
+            return False
+        follow.delete()
+    return True
+
+
+def invalidate(user_id):
+    """Сбрасывает подписки пользователя после подписки или отписки."""
+    _following.discard(user_id)
+    feed_cache.bump(_scope(user_id))
@@ -1,5 +1,7 @@
+from django.db import transaction
 from django.forms import ModelForm
 
+from . import thumbnails
 from .models import Comment, Post
 
 
@@ -13,6 +15,13 @@ class PostForm(ModelForm):
             'Выберите группу'
         )
 
+    def save(self, commit=True):
+        post = super().save(commit)
+        if commit and 'image' in self.changed_data and post.image:
+            name = post.image.name
+            transaction.on_commit(lambda: thumbnails.schedule(name))
+        return post
+
     class Meta():
         model = Post
         fields = ('text', 'group', 'image')
@@ -0,0 +1,261 @@
+import json
+import math
+import random
+import statistics
+import time
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import mixer
+
+from posts import bulk
+from posts.models import Group, Post, User
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values, percent):
+    """Процентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу тестовыми данными и измеряет время ответа, '
+        'число SQL-запросов и размер страниц лент. Результат выводится '
+        'в JSON, чтобы сравнивать запуски между релизами. По умолчанию '
+        'работает во временной тестовой базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--follows', type=int, default=2000)
+        parser.add_argument(
+            '--pages',
+            type=int,
+            nargs='+',
+            default=[1, 10, 50],
+            help='Номера страниц лент, на которых делаются замеры.',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Сколько раз запрашивать каждую страницу.',
+        )
+        parser.add_argument(
+            '--cache',
+            choices=('warm', 'cold', 'both'),
+            default='both',
+            help='cold - кэш очищается перед каждым запросом.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--current-db',
+            action='store_true',
+            help='Работать в текущей базе, а не во временной.',
+        )
+        parser.add_argument(
+            '--no-seed',
+            action='store_true',
+            help='Не добавлять данные, измерять на имеющихся.',
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл для JSON-отчета, по умолчанию stdout.',
+        )
+
+    def handle(self, *args, **options):
+        if options['current_db']:
+            report = self.run(options)
+        else:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                report = self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                stream.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def run(self, options):
+        if not options['no_seed']:
+            started = time.monotonic()
+            self.seed(options)
+            seed_seconds = time.monotonic() - started
+        else:
+            seed_seconds = 0
+        modes = (
+            ('warm', 'cold') if options['cache'] == 'both'
+            else (options['cache'],)
+        )
+        results = []
+        for view, url, client in self.targets(options['pages']):
+            for mode in modes:
+                results.append({
+                    'view': view,
+                    'url': url,
+                    'cache': mode,
+                    **self.measure(client, url, options['repeat'], mode),
+                })
+        return {
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'pagination': settings.POSTS_PAGINATION,
+            'posts_per_page': settings.POSTS_PER_PAGE,
+            'dataset': {
+                'users': User.objects.count(),
+                'groups': Group.objects.count(),
+                'posts': Post.objects.count(),
+                'seed': options['seed'],
+                'seed_seconds': round(seed_seconds, 2),
+            },
+            'repeat': options['repeat'],
+            'results': results,
+        }
+
+    def seed(self, options):
+        """Добавляет пользователей и группы через mixer, а посты,
+        комментарии и подписки - пачками через posts.bulk."""
+        random.seed(options['seed'])
+        Faker.seed(options['seed'])
+        fake = Faker('ru_RU')
+        prefix = f'bench{options["seed"]}_{int(time.time())}_'
+        users = mixer.cycle(options['users']).blend(
+            User, username=mixer.sequence(prefix + 'user{0}')
+        )
+        groups = mixer.cycle(options['groups']).blend(
+            Group, slug=mixer.sequence(prefix + 'group{0}')
+        )
+        usernames = [user.username for user in users]
+        slugs = [group.slug for group in groups]
+        if not usernames:
+            return
+        now = timezone.now()
+
+        def moment():
+            return (
+                now - timedelta(seconds=random.randint(0, 365 * 24 * 3600))
+            ).isoformat()
+
+        first_id = (Post.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0) + 1
+        post_ids = range(first_id, first_id + options['posts'])
+        bulk.Importer('posts', 500).run(
+            {
+                'id': post_id,
+                'author': random.choice(usernames),
+                'group': (
+                    random.choice(slugs)
+                    if slugs and random.random() < 0.7 else ''
+                ),
+                'text': fake.text(max_nb_chars=400),
+                'pub_date': moment(),
+            }
+            for post_id in post_ids
+        )
+        if post_ids:
+            bulk.Importer('comments', 500).run(
+                {
+                    'post': random.choice(post_ids),
+                    'author': random.choice(usernames),
+                    'text': fake.sentence(),
+                    'created': moment(),
+                }
+                for _ in range(options['comments'])
+            )
+        # Подписки распределены по Парето: у немногих авторов
+        # много подписчиков, как в настоящей социальной сети.
+        bulk.Importer('follows', 500).run(
+            {
+                'user': random.choice(usernames),
+                'author': usernames[
+                    min(int(random.paretovariate(1.2)), len(usernames)) - 1
+                ],
+            }
+            for _ in range(options['follows'])
+        )
+
+    def targets(self, pages):
+        """Страницы для замеров: (имя view, url, клиент)."""
+        guest = Client()
+        group = Group.objects.annotate(
+            total=Count('posts')
+        ).order_by('-total').first()
+        author = User.objects.order_by('-stats__posts_count').first()
+        reader = User.objects.order_by('-stats__following_count').first()
+        post = Post.objects.order_by('-comments_count').first()
+        if author is None or post is None:
+            raise CommandError('В базе нет постов для замеров.')
+        member = Client()
+        member.force_login(reader)
+        for page in pages:
+            query = f'?page={page}'
+            yield 'index', reverse('posts:index') + query, guest
+            if group is not None:
+                yield (
+                    'group_posts',
+                    reverse('posts:group_list', args=(group.slug,)) + query,
+                    guest,
+                )
+            yield (
+                'profile',
+                reverse('posts:profile', args=(author.username,)) + query,
+                guest,
+            )
+            yield 'follow_index', reverse('posts:follow_index') + query, member
+        yield (
+            'post_detail',
+            reverse('posts:post_detail', args=(post.id,)),
+            guest,
+        )
+
+    def measure(self, client, url, repeat, mode):
+        timings = []
+        queries = []
+        if mode == 'warm':
+            client.get(url)
+        for _ in range(repeat):
+            if mode == 'cold':
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(
+                    f'{url} ответил кодом {response.status_code}'
+                )
+            queries.append(len(captured))
+        return {
+            'latency_ms': {
+                'mean': round(statistics.mean(timings), 2),
+                **{
+                    f'p{percent}': round(percentile(timings, percent), 2)
+                    for percent in PERCENTILES
+                },
+            },
+            'queries': {'min': min(queries), 'max': max(queries)},
+            'bytes': len(response.content),
+        }
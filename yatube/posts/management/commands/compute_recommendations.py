@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации «кого почитать» по графу подписок. '
+        'Запускается периодически, например из cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            help='Сколько рекомендаций хранить для пользователя.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Для скольких пользователей сохранять рекомендации '
+                 'в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        saved = recommendations.compute(
+            options['top_k'], options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Сохранено {saved} рекомендаций '
+            f'за {time.monotonic() - started:.2f} с.'
+        ))
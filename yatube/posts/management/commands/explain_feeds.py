@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import feeds
+from posts.models import Group, Post, User
+from posts.utils import CursorPaginator
+
+
+class Command(BaseCommand):
+    help = (
+        'Выводит план выполнения (EXPLAIN QUERY PLAN) запросов лент '
+        'постов: первой страницы и страниц после и перед курсором, '
+        'чтобы проверить использование индексов после деплоя.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username',
+            help='Пользователь для лент profile и follow_index.',
+        )
+        parser.add_argument(
+            '--group',
+            help='Slug группы для ленты group_posts.',
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_object(User, username=options['username'])
+        group = self.get_object(Group, slug=options['group'])
+        post = Post.objects.first() or Post(id=0)
+        paginators = {
+            name: CursorPaginator(queryset, settings.POSTS_PER_PAGE)
+            for name, queryset in (
+                ('index', feeds.index_posts()),
+                ('group_posts', feeds.group_posts_list(group)),
+                ('profile', feeds.profile_posts(user)),
+                ('follow_index', feeds.follow_posts(user)),
+            )
+        }
+        paginators['post_detail comments'] = feeds.comments_paginator(post)
+        for name, paginator in paginators.items():
+            self.explain(name, paginator.page_query())
+            first = paginator.object_list.first()
+            if first is None:
+                continue
+            cursor = paginator.encode_cursor(first)
+            self.explain(f'{name} after', paginator.page_query(after=cursor))
+            self.explain(
+                f'{name} before', paginator.page_query(before=cursor)
+            )
+
+    def explain(self, name, page):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{name}:'))
+        self.stdout.write(str(page.query))
+        self.stdout.write(page.explain())
+        self.stdout.write('')
+
+    def get_object(self, model, **lookup):
+        """Возвращает объект по lookup или первый в таблице."""
+        if all(value is None for value in lookup.values()):
+            instance = model.objects.first()
+            return instance if instance is not None else model(id=0)
+        try:
+            return model.objects.get(**lookup)
+        except model.DoesNotExist:
+            raise CommandError(f'{model.__name__} {lookup} не найден.')
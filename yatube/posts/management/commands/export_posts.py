@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии или подписки в JSON Lines или CSV. '
+        'Записи читаются из базы пачками и пишутся потоком.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=bulk.KINDS)
+        parser.add_argument(
+            '--output',
+            default='-',
+            help='Файл для выгрузки, по умолчанию stdout.',
+        )
+        parser.add_argument(
+            '--format', choices=bulk.FORMATS, default='jsonl',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Сколько строк читать из базы за один запрос.',
+        )
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        started = time.monotonic()
+        rows = bulk.export_rows(kind, options['batch_size'])
+        fields = bulk.EXPORT_FIELDS[kind]
+        if options['output'] == '-':
+            written = bulk.write_rows(
+                self.stdout, options['format'], fields, rows
+            )
+            report = self.stderr
+        else:
+            with open(
+                options['output'], 'w', encoding='utf-8', newline=''
+            ) as stream:
+                written = bulk.write_rows(
+                    stream, options['format'], fields, rows
+                )
+            report = self.stdout
+        elapsed = time.monotonic() - started
+        report.write(self.style.SUCCESS(
+            f'Выгружено {written} строк за {elapsed:.2f} с '
+            f'({written / max(elapsed, 1e-6):.0f} строк/с).'
+        ))
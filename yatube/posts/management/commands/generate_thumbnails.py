@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает стандартные миниатюры для изображений постов, '
+        'у которых их еще нет (например, загруженных через админку).'
+    )
+
+    def handle(self, *args, **options):
+        names = (
+            Post.objects.exclude(image='')
+            .values_list('image', flat=True)
+            .distinct()
+        )
+        created = 0
+        for name in names.iterator():
+            if thumbnails.missing(name) and thumbnails.generate(name):
+                created += 1
+                for post in Post.objects.filter(image=name):
+                    post.save(update_fields=('updated',))
+        self.stdout.write(self.style.SUCCESS(
+            f'Созданы миниатюры для {created} изображений.'
+        ))
@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает посты, комментарии или подписки из JSON Lines или CSV '
+        '(в формате export_posts). Строки сохраняются пачками через '
+        'bulk_create, после загрузки пересчитываются счетчики, ленты '
+        'подписок и поисковый индекс.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=bulk.KINDS)
+        parser.add_argument(
+            'path', help='Файл для загрузки, «-» - stdin.',
+        )
+        parser.add_argument(
+            '--format',
+            choices=bulk.FORMATS,
+            help='Формат файла, по умолчанию по расширению.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько строк сохранять в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format_ = options['format']
+        if format_ is None:
+            format_ = os.path.splitext(path)[1].lstrip('.') or 'jsonl'
+        if format_ not in bulk.FORMATS:
+            raise CommandError(f'Неизвестный формат файла: {format_}')
+        importer = bulk.Importer(options['kind'], options['batch_size'])
+        started = time.monotonic()
+        if path == '-':
+            importer.run(bulk.read_rows(sys.stdin, format_))
+        else:
+            with open(path, encoding='utf-8', newline='') as stream:
+                importer.run(bulk.read_rows(stream, format_))
+        elapsed = time.monotonic() - started
+        rows = importer.imported + importer.skipped
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено {importer.imported} строк, пропущено '
+            f'{importer.skipped}, за {elapsed:.2f} с '
+            f'({rows / max(elapsed, 1e-6):.0f} строк/с).'
+        ))
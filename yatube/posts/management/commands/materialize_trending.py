@@ -0,0 +1,25 @@
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает популярные посты и группы по журналу комментариев '
+        'в кэше. Запускается периодически, например раз в минуту из cron.'
+    )
+
+    def handle(self, *args, **options):
+        if isinstance(caches['default'], LocMemCache):
+            # Журнал в памяти этого процесса пуст, и команда стерла бы
+            # все популярное.
+            raise CommandError(
+                'Журнал комментариев недоступен: кэш хранится в памяти '
+                'процесса. Задайте общий кэш, например YATUBE_MEMCACHED.'
+            )
+        posts, groups = trending.materialize()
+        self.stdout.write(self.style.SUCCESS(
+            f'Сохранено популярных постов: {posts}, групп: {groups}.'
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import counters
+from posts.models import Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счетчики постов, подписчиков, подписок '
+        'и комментариев по данным таблиц.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк пересчитывать одним запросом.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        users = 0
+        for batch in counters.id_batches(User.objects.all(), batch_size):
+            with transaction.atomic():
+                counters.recount_user_stats(batch)
+            users += len(batch)
+        posts = 0
+        for batch in counters.id_batches(Post.objects.all(), batch_size):
+            counters.recount_comments(batch)
+            posts += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитаны счетчики {users} пользователей и {posts} постов.'
+        ))
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+def reindex(apps, schema_editor, document):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DELETE FROM posts_post_fts')
+        cursor.executemany(
+            'INSERT INTO posts_post_fts (rowid, text) VALUES (%s, %s)',
+            (
+                (post_id, document(text))
+                for post_id, text in Post.objects.values_list(
+                    'id', 'text'
+                ).iterator()
+            ),
+        )
+
+
+def stem_index(apps, schema_editor):
+    from posts.stemmer import tokenize
+
+    reindex(apps, schema_editor, lambda text: ' '.join(tokenize(text)))
+
+
+def unstem_index(apps, schema_editor):
+    reindex(apps, schema_editor, lambda text: text)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_post_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(stem_index, unstem_index),
+    ]
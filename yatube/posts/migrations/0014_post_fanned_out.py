@@ -0,0 +1,32 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_not_fanned_out(apps, schema_editor):
+    """Посты авторов, которые сейчас не раскладываются в ленты."""
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.filter(
+        author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).update(fanned_out=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_trending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='fanned_out',
+            field=models.BooleanField(default=True, editable=False, verbose_name='В лентах подписчиков'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(fanned_out=False), fields=['author', '-pub_date'], name='post_not_fanned_out_idx'),
+        ),
+        migrations.RunPython(mark_not_fanned_out, migrations.RunPython.noop),
+    ]
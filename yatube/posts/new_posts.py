@@ -0,0 +1,88 @@
+"""Журнал новых постов для уведомлений открытых лент.
+
+После коммита нового поста его id, автор и группа записываются в кэш
+под очередным номером счетчика, еще не занятым другим событием.
+Клиент открытой ленты периодически спрашивает, что появилось после
+известного ему номера, получает id новых постов своей ленты и
+загружает только их карточки вместо всей страницы. Журнал хранит
+последние NEW_POSTS_BACKLOG событий; клиент, отставший сильнее,
+получает reset и перезагружает ленту целиком.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+LAST_KEY = 'new_posts:last'
+
+
+def _event_key(number):
+    return f'new_posts:{number}'
+
+
+def _timeout():
+    return settings.NEW_POSTS_TTL
+
+
+def _next_number():
+    cache.add(LAST_KEY, 0, None)
+    try:
+        return cache.incr(LAST_KEY)
+    except ValueError:
+        # Счетчик вытеснен из кэша между add и incr.
+        cache.set(LAST_KEY, 1, None)
+        return 1
+
+
+def publish(post_id, author_id, group_id):
+    """Записывает новый пост в журнал."""
+    event = (post_id, author_id, group_id)
+    # incr атомарен не во всех бэкендах кэша, и номер мог достаться
+    # параллельному посту: тогда берем следующий.
+    while not cache.add(_event_key(_next_number()), event, _timeout()):
+        pass
+
+
+def last_number():
+    return cache.get(LAST_KEY) or 0
+
+
+def events(since, last):
+    """События с номерами после since до last включительно: список
+    троек (id поста, id автора, id группы).
+
+    Отсутствующее событие в последних NEW_POSTS_PENDING номерах
+    считается еще не записанным: номер уже выдан, но запись в кэш не
+    завершилась, и чтение на нем останавливается. Более старые пропуски
+    (событие истекло или вытеснено из кэша) пропускаются. Возвращает
+    события и номер последнего прочитанного.
+    """
+    found = cache.get_many(
+        [_event_key(number) for number in range(since + 1, last + 1)]
+    )
+    result = []
+    for number in range(since + 1, last + 1):
+        event = found.get(_event_key(number))
+        if event is not None:
+            result.append(event)
+        elif last - number < settings.NEW_POSTS_PENDING:
+            return result, number - 1
+    return result, last
+
+
+def poll(since, matches):
+    """Новые посты после номера since, для которых
+    matches(author_id, group_id) истинно.
+
+    Отвечает сразу, не дожидаясь новых постов: клиент повторяет запрос
+    через NEW_POSTS_POLL_INTERVAL секунд. Возвращает словарь для ответа
+    клиенту: номер последнего прочитанного события и id новых постов,
+    или reset, если since слишком стар или журнал сброшен.
+    """
+    last = last_number()
+    if since < 0 or since > last or last - since > settings.NEW_POSTS_BACKLOG:
+        return {'last': last, 'posts': [], 'reset': True}
+    found, last = events(since, last)
+    posts = [
+        post_id for post_id, author_id, group_id in found
+        if matches(author_id, group_id)
+    ]
+    return {'last': last, 'posts': posts, 'reset': False}
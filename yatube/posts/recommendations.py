@@ -0,0 +1,128 @@
+"""Рекомендации «кого почитать» по графу подписок.
+
+Граф подписок целиком загружается в память как разреженная матрица
+смежности (словари множеств), и для каждого пользователя считается
+оценка кандидатов:
+
+* друзья друзей - по единице за каждого автора из подписок
+  пользователя, который сам подписан на кандидата;
+* похожие читатели - косинусная близость подписок пользователя и
+  другого читателя, добавленная каждому автору из подписок читателя.
+
+Авторы, у которых подписчиков больше RECOMMENDATIONS_MAX_FOLLOWERS,
+не участвуют в поиске похожих читателей: они есть почти у всех и
+только замедляют расчет. Пользователи без подписок получают самых
+популярных авторов. Лучшие RECOMMENDATIONS_TOP_K кандидатов
+сохраняются в таблицу Recommendation.
+"""
+import heapq
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from . import feed_cache
+from .counters import id_batches
+from .models import Follow, Recommendation, User
+
+SCOPE = ('recommendations',)
+
+
+def load_graph():
+    """Подписки и подписчики всех пользователей: два словаря
+    «id -> множество id»."""
+    following = defaultdict(set)
+    followers = defaultdict(set)
+    pairs = Follow.objects.values_list('user_id', 'author_id')
+    for user_id, author_id in pairs.iterator(chunk_size=10000):
+        following[user_id].add(author_id)
+        followers[author_id].add(user_id)
+    return following, followers
+
+
+def _top(scores, top_k):
+    """Лучшие top_k пар (id, оценка); при равных оценках - меньший id."""
+    return heapq.nlargest(
+        top_k, scores.items(), key=lambda item: (item[1], -item[0])
+    )
+
+
+def suggest(user_id, following, followers, top_k, popular=()):
+    """Лучшие кандидаты для пользователя: список пар (id, оценка)."""
+    followed = following.get(user_id, set())
+    scores = defaultdict(float)
+    overlap = defaultdict(int)
+    for author_id in followed:
+        for candidate in following.get(author_id, ()):
+            scores[candidate] += 1
+        readers = followers.get(author_id, ())
+        if len(readers) > settings.RECOMMENDATIONS_MAX_FOLLOWERS:
+            continue
+        for reader in readers:
+            overlap[reader] += 1
+    overlap.pop(user_id, None)
+    for reader, common in overlap.items():
+        similarity = common / math.sqrt(
+            len(followed) * len(following[reader])
+        )
+        for candidate in following[reader]:
+            scores[candidate] += similarity
+    scores.pop(user_id, None)
+    for author_id in followed:
+        scores.pop(author_id, None)
+    top = _top(scores, top_k)
+    if len(top) < top_k:
+        chosen = {candidate for candidate, score in top}
+        top.extend(
+            (author_id, 0.0) for author_id in popular
+            if author_id not in chosen
+            and author_id not in followed
+            and author_id != user_id
+        )
+    return top[:top_k]
+
+
+def compute(top_k=None, batch_size=500):
+    """Пересчитывает рекомендации всех пользователей,
+    возвращает число сохраненных рекомендаций."""
+    top_k = top_k or settings.RECOMMENDATIONS_TOP_K
+    following, followers = load_graph()
+    popular = [
+        author_id for author_id, score in _top(
+            {author_id: len(readers) for author_id, readers in
+             followers.items()},
+            top_k * 2,
+        )
+    ]
+    saved = 0
+    for user_ids in id_batches(User.objects.all(), batch_size):
+        recommendations = [
+            Recommendation(user_id=user_id, author_id=author_id, score=score)
+            for user_id in user_ids
+            for author_id, score in suggest(
+                user_id, following, followers, top_k, popular
+            )
+        ]
+        with transaction.atomic():
+            Recommendation.objects.filter(user_id__in=user_ids).delete()
+            Recommendation.objects.bulk_create(recommendations)
+        saved += len(recommendations)
+    feed_cache.bump(SCOPE)
+    return saved
+
+
+def recommended_authors(user, exclude=None):
+    """Рекомендованные пользователю авторы одним запросом по индексу
+    (user, -score)."""
+    if not user.is_authenticated:
+        return []
+    recommendations = Recommendation.objects.filter(
+        user=user
+    ).select_related('author')
+    if exclude is not None:
+        recommendations = recommendations.exclude(author=exclude)
+    return [
+        recommendation.author for recommendation in
+        recommendations[:settings.RECOMMENDATIONS_SHOWN]
+    ]
@@ -0,0 +1,137 @@
+"""Полнотекстовый поиск по постам.
+
+Тексты постов хранятся в инвертированном индексе, который обновляется
+сигналами при создании, редактировании и удалении поста. Реализация
+индекса выбирается настройкой POSTS_SEARCH_BACKEND: по умолчанию это
+виртуальная таблица SQLite FTS5 в той же базе, что и посты. И тексты,
+и запросы проходят через posts.stemmer, поэтому поиск находит слова
+в любой форме.
+"""
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from . import stemmer
+from .counters import id_batches
+from .models import Post
+
+
+class BaseSearchBackend:
+    """Интерфейс поискового индекса постов."""
+
+    def index(self, posts):
+        """Добавляет или обновляет посты в индексе."""
+        raise NotImplementedError
+
+    def remove(self, post_ids):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def search(self, query, limit):
+        """Возвращает id постов, подходящих под query,
+        самые релевантные первыми."""
+        raise NotImplementedError
+
+    def rebuild(self, batch_size=1000):
+        """Заново строит индекс по всем постам, возвращает их число."""
+        self.clear()
+        indexed = 0
+        for ids in id_batches(Post.objects.all(), batch_size):
+            self.index(Post.objects.filter(id__in=ids).only('id', 'text'))
+            indexed += len(ids)
+        return indexed
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """Поиск без индекса через LIKE, для баз без полнотекстового
+    поиска. Результаты упорядочены по дате."""
+
+    def index(self, posts):
+        pass
+
+    def remove(self, post_ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, query, limit):
+        posts = Post.objects.all()
+        for word in stemmer.tokenize(query):
+            posts = posts.filter(text__icontains=word)
+        return list(posts.values_list('id', flat=True)[:limit])
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """Индекс в виртуальной таблице FTS5, rowid записи равен id поста.
+
+    Таблица создается миграцией posts.0010_post_search_index.
+    """
+
+    table = 'posts_post_fts'
+
+    def document(self, post):
+        """Текст, который попадает в индекс: основы слов поста."""
+        return ' '.join(stemmer.tokenize(post.text))
+
+    def match_expression(self, query):
+        """Превращает ввод пользователя в запрос FTS5: основы всех
+        слов обязательны, последняя ищется по префиксу. Операторы FTS5
+        из ввода не используются."""
+        terms = [f'"{word}"' for word in stemmer.tokenize(query)]
+        if not terms:
+            return None
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def index(self, posts):
+        rows = [(post.id, self.document(post)) for post in posts]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {self.table} (rowid, text) '
+                'VALUES (%s, %s)',
+                rows,
+            )
+
+    def remove(self, post_ids):
+        post_ids = list(post_ids)
+        if not post_ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [(post_id,) for post_id in post_ids],
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    def search(self, query, limit):
+        expression = self.match_expression(query)
+        if expression is None:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {self.table} '
+                f'WHERE {self.table} MATCH %s ORDER BY rank LIMIT %s',
+                (expression, limit),
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+def get_backend():
+    return import_string(settings.POSTS_SEARCH_BACKEND)()
+
+
+def search_ids(query, limit=None):
+    """Id найденных постов в порядке релевантности."""
+    if not query.strip():
+        return []
+    return get_backend().search(
+        query, limit or settings.SEARCH_RESULTS_LIMIT
+    )
@@ -0,0 +1,126 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import (
+    counters, feed_cache, follow_graph, new_posts, search, timeline,
+    trending,
+)
+from .models import (
+    Comment, Follow, Group, Post, Recommendation, User, UserStats,
+)
+
+
+def post_feed_scopes(post, previous_group_id=None):
+    """Ленты, в которых показывается пост или показывался до переноса
+    из группы previous_group_id. Ленты подписок не кэшируются целиком:
+    их карточки кэшируются по отдельности."""
+    scopes = [
+        ('index',),
+        ('profile', post.author_id),
+        ('post', post.id),
+    ]
+    for group_id in {post.group_id, previous_group_id} - {None}:
+        scopes.append(('group', group_id))
+    return scopes
+
+
+def invalidate_post_feeds(post, previous_group_id=None):
+    """Сбрасывает все ленты, в которых показывается пост."""
+    feed_cache.bump(*post_feed_scopes(post, previous_group_id))
+
+
+def invalidate_comment_feeds(comment):
+    """Сбрасывает страницу поста. Карточки в списках обновляются сами:
+    в ключе их фрагмента есть счетчик комментариев."""
+    feed_cache.bump(('post', comment.post_id), feed_cache.COMMENTS)
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, update_fields, **kwargs):
+    """Запоминает группу, в которой пост сохранен сейчас: если его
+    переносят, лента прежней группы тоже сбрасывается."""
+    instance.previous_group_id = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and not {'group', 'group_id'} & set(
+        update_fields
+    ):
+        return
+    instance.previous_group_id = Post.objects.filter(
+        pk=instance.pk
+    ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.bulk_create(
+            [UserStats(user=instance)], ignore_conflicts=True
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, update_fields, **kwargs):
+    if created:
+        counters.change_user_stats(instance.author_id, posts_count=1)
+        timeline.fan_out(instance)
+        event = (instance.id, instance.author_id, instance.group_id)
+        transaction.on_commit(lambda: new_posts.publish(*event))
+    if update_fields is None or 'text' in update_fields:
+        search.get_backend().index([instance])
+    invalidate_post_feeds(instance, instance.previous_group_id)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user_stats(instance.author_id, posts_count=-1)
+    search.get_backend().remove([instance.id])
+    invalidate_post_feeds(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comments_count(instance.post_id, 1)
+        post_id, group_id = instance.post_id, instance.post.group_id
+        transaction.on_commit(lambda: trending.record(post_id, group_id))
+    invalidate_comment_feeds(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comments_count(instance.post_id, -1)
+    invalidate_comment_feeds(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    feed_cache.bump(('group', instance.id), feed_cache.GLOBAL)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_stats(instance.author_id, followers_count=1)
+        counters.change_user_stats(instance.user_id, following_count=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        Recommendation.objects.filter(
+            user_id=instance.user_id, author_id=instance.author_id
+        ).delete()
+    follow_graph.invalidate(instance.user_id)
+    feed_cache.bump(
+        ('follow', instance.user_id), ('profile', instance.author_id)
+    )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user_stats(instance.author_id, followers_count=-1)
+    counters.change_user_stats(instance.user_id, following_count=-1)
+    timeline.remove(instance.user_id, instance.author_id)
+    follow_graph.invalidate(instance.user_id)
+    feed_cache.bump(
+        ('follow', instance.user_id), ('profile', instance.author_id)
+    )
@@ -0,0 +1,148 @@
+"""Токенизатор и стеммер для русского текста.
+
+Слова приводятся к нижнему регистру, «ё» заменяется на «е», а у
+кириллических слов отрезаются окончания по алгоритму Snowball для
+русского языка, поэтому «лес», «леса» и «лесу» попадают в индекс
+одной основой. Основы слов кэшируются: в текстах постов одни и те же
+слова повторяются постоянно, и при переиндексации почти все они берутся
+из кэша.
+"""
+import re
+from functools import lru_cache
+
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile(r'^[а-я]+$')
+VOWELS = 'аеиоуыэюя'
+STEM_CACHE_SIZE = 100_000
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+REFLEXIVE = ('ся', 'сь')
+ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+VERB = (
+    (
+        'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+        'ет', 'ют', 'ны', 'ть', 'ешь', 'нно',
+    ),
+    (
+        'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+        'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+        'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+    ),
+)
+NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+    'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+    'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+    'ья', 'я',
+)
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+
+def _regions(word):
+    """Позиции начала областей RV и R2 алгоритма Snowball."""
+    rv = r1 = r2 = len(word)
+    for index in range(len(word) - 1):
+        if word[index] in VOWELS:
+            rv = index + 1
+            break
+    for index in range(1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            r1 = index + 1
+            break
+    for index in range(r1 + 1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            r2 = index + 1
+            break
+    return rv, r2
+
+
+def _ending(word, start, endings):
+    """Самое длинное окончание из endings, целиком лежащее после start."""
+    found = ''
+    for ending in endings:
+        if (
+            len(ending) > len(found)
+            and word.endswith(ending)
+            and len(word) - len(ending) >= start
+        ):
+            found = ending
+    return found
+
+
+def _remove(word, start, endings, after_a=()):
+    """Отрезает самое длинное окончание из endings или after_a.
+
+    Окончания after_a отрезаются, только если перед ними стоит «а»
+    или «я». Возвращает None, если окончание не найдено.
+    """
+    ending = _ending(word, start, (*endings, *after_a))
+    if not ending:
+        return None
+    stem = word[:-len(ending)]
+    if ending not in endings and not (
+        len(stem) > start and stem[-1] in 'ая'
+    ):
+        return None
+    return stem
+
+
+def _adjectival(word, rv):
+    stem = _remove(word, rv, ADJECTIVE)
+    if stem is None:
+        return None
+    participle = _remove(stem, rv, PARTICIPLE[1], after_a=PARTICIPLE[0])
+    return stem if participle is None else participle
+
+
+def _stem(word):
+    rv, r2 = _regions(word)
+    stem = _remove(
+        word, rv, PERFECTIVE_GERUND[1], after_a=PERFECTIVE_GERUND[0]
+    )
+    if stem is None:
+        word = _remove(word, rv, REFLEXIVE) or word
+        stem = (
+            _adjectival(word, rv)
+            or _remove(word, rv, VERB[1], after_a=VERB[0])
+            or _remove(word, rv, NOUN)
+        )
+    if stem is not None:
+        word = stem
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+    if _ending(word, r2, DERIVATIONAL):
+        word = word[:-len(_ending(word, r2, DERIVATIONAL))]
+    superlative = _ending(word, rv, SUPERLATIVE)
+    if superlative:
+        word = word[:-len(superlative)]
+    if word.endswith('нн') and len(word) - 1 >= rv:
+        word = word[:-1]
+    elif not superlative and word.endswith('ь') and len(word) - 1 >= rv:
+        word = word[:-1]
+    return word
+
+
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def stem(word):
+    """Основа слова word, записанного в нижнем регистре."""
+    word = word.replace('ё', 'е')
+    if not CYRILLIC_RE.match(word):
+        return word
+    return _stem(word)
+
+
+def tokenize(text):
+    """Основы всех слов текста по порядку."""
+    return [stem(word) for word in WORD_RE.findall(text.lower())]
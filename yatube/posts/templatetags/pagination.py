@@ -0,0 +1,28 @@
+from django import template
+from django.conf import settings
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from posts.utils import elided_page_range, encode_cursor
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_window(page_obj):
+    """Номера страниц вокруг текущей; None - пропуск."""
+    return elided_page_range(page_obj)
+
+
+@register.simple_tag
+def more_posts_url(page_obj, feed, slug=''):
+    """Адрес следующих карточек ленты feed для бесконечной прокрутки
+    или пустая строка, если догружать нечего."""
+    if not settings.POSTS_INFINITE_SCROLL or not feed:
+        return ''
+    if not page_obj.has_next():
+        return ''
+    params = {'feed': feed, 'after': encode_cursor(page_obj[-1])}
+    if slug:
+        params['slug'] = slug
+    return f'{reverse("posts:post_cards")}?{urlencode(params)}'
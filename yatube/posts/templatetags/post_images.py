@@ -0,0 +1,11 @@
+from django import template
+
+from posts.thumbnails import ready_picture
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_picture(image):
+    """Миниатюры изображения для <picture> или None, пока они создаются."""
+    return ready_picture(image)
@@ -1,11 +1,14 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from .. import thumbnails
 from ..models import Comment, Group, Post, User
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -92,6 +95,29 @@ class PostCreateFormTests(TestCase):
                 self.assertEquals(last_post.group, self.post.group)
                 self.assertEquals(last_post.image, self.post.image)
 
+    def test_thumbnail_is_generated_off_request(self):
+        """Проверяем, что страница поста не создает миниатюру сама,
+        а показывает заглушку, пока миниатюра не готова."""
+        image = Image.new('RGB', (20, 10), color='red')
+        content = BytesIO()
+        image.save(content, 'PNG')
+        post = Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('red.png', content.getvalue()),
+        )
+        url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'Изображение обрабатывается')
+        self.assertTrue(thumbnails.generate(post.image.name))
+        post.save(update_fields=('updated',))
+        response = self.guest_client.get(url)
+        self.assertNotContains(response, 'Изображение обрабатывается')
+        self.assertContains(response, '<img class="card-img my-2"')
+        self.assertContains(response, '<picture>')
+        for width in settings.POST_IMAGE_WIDTHS:
+            self.assertContains(response, f' {width}w')
+
     def test_editing_and_creating_post_by_guest(self):
         """Проверяем может ли гость создавать и редактировать посты."""
         posts_count = Post.objects.count()
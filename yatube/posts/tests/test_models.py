@@ -1,6 +1,19 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
-from ..models import Comment, Group, Post, User
+from .. import follow_graph, search
+from ..models import (
+    Comment, Follow, Group, Post, TimelineEntry, User, UserStats,
+)
 
 
 class PostModelTest(TestCase):
@@ -90,3 +103,189 @@ class PostModelTest(TestCase):
                         'verbose_name задан неверно'
                     )
                 )
+
+    def test_follow_is_unique(self):
+        """Проверяем, что нельзя дважды подписаться на одного автора."""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.user)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=reader, author=self.user)
+
+
+class CountersTest(TestCase):
+    """Класс для проверки денормализованных счетчиков."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Создаем автора с постом и читателя."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def assertStats(self, user, **expected):
+        stats = UserStats.objects.get(user=user)
+        for field, value in expected.items():
+            with self.subTest(user=user, field=field):
+                self.assertEqual(getattr(stats, field), value)
+
+    def test_counters_follow_changes(self):
+        """Проверяем изменение счетчиков при создании и удалении
+        постов, комментариев и подписок."""
+        self.assertStats(self.author, posts_count=1, followers_count=0)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        self.assertStats(self.author, followers_count=1)
+        self.assertStats(self.reader, following_count=1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        comment.delete()
+        follow.delete()
+        Post.objects.create(author=self.author, text='Второй пост')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertStats(self.author, posts_count=2, followers_count=0)
+        self.assertStats(self.reader, following_count=0)
+
+    def test_recount_stats_command(self):
+        """Проверяем, что команда recount_stats чинит счетчики."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        UserStats.objects.update(
+            posts_count=10, followers_count=10, following_count=10
+        )
+        Post.objects.update(comments_count=10)
+        call_command('recount_stats', batch_size=1, stdout=StringIO())
+        self.assertStats(
+            self.author, posts_count=1, followers_count=1, following_count=0
+        )
+        self.assertStats(
+            self.reader, posts_count=0, followers_count=0, following_count=1
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+
+class ImportExportTest(TestCase):
+    """Класс для проверки команд import_posts и export_posts."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Первый пост'
+        )
+        Post.objects.filter(id=self.post.id).update(
+            pub_date=timezone.now() - timedelta(days=30)
+        )
+        self.post.refresh_from_db()
+        Post.objects.create(author=self.author, text='Второй пост')
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def export(self, kind, format_):
+        path = os.path.join(self.directory, f'{kind}.{format_}')
+        call_command('export_posts', kind, output=path, format=format_,
+                     stdout=StringIO())
+        return path
+
+    def test_round_trip(self):
+        """Проверяем, что выгруженные данные загружаются обратно вместе
+        с датами, счетчиками, лентой подписок и поисковым индексом."""
+        paths = [
+            ('posts', self.export('posts', 'jsonl')),
+            ('comments', self.export('comments', 'csv')),
+            ('follows', self.export('follows', 'jsonl')),
+        ]
+        pub_dates = dict(Post.objects.values_list('id', 'pub_date'))
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        self.assertFalse(search.search_ids('пост'))
+        self.assertFalse(
+            follow_graph.is_following(self.reader.id, self.author.id)
+        )
+        for kind, path in paths:
+            call_command('import_posts', kind, path, batch_size=1,
+                         stdout=StringIO())
+        self.assertEqual(
+            dict(Post.objects.values_list('id', 'pub_date')), pub_dates
+        )
+        self.assertEqual(
+            Post.objects.get(id=self.post.id).group_id, self.group.id
+        )
+        self.assertEqual(Comment.objects.get().post_id, self.post.id)
+        self.assertEqual(
+            Post.objects.get(id=self.post.id).comments_count, 1
+        )
+        stats = UserStats.objects.get(user=self.author)
+        self.assertEqual((stats.posts_count, stats.followers_count), (2, 1))
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+        self.assertEqual(len(search.search_ids('пост')), 2)
+        self.assertTrue(
+            follow_graph.is_following(self.reader.id, self.author.id)
+        )
+
+    def test_unknown_references_are_skipped(self):
+        """Проверяем, что строки с неизвестными авторами пропускаются,
+        а повторная загрузка не создает дубликатов."""
+        path = os.path.join(self.directory, 'posts.jsonl')
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write('{"author": "author", "text": "Новый пост"}\n')
+            stream.write('{"author": "nobody", "text": "Чужой пост"}\n')
+        output = StringIO()
+        call_command('import_posts', 'posts', path, stdout=output)
+        self.assertIn('пропущено 1', output.getvalue())
+        self.assertTrue(Post.objects.filter(text='Новый пост').exists())
+        self.assertEqual(search.search_ids('новый'), [
+            Post.objects.get(text='Новый пост').id
+        ])
+        follows = self.export('follows', 'csv')
+        output = StringIO()
+        call_command('import_posts', 'follows', follows, stdout=output)
+        self.assertIn('Загружено 0 строк, пропущено 1', output.getvalue())
+        self.assertEqual(Follow.objects.count(), 1)
+        posts = self.export('posts', 'jsonl')
+        output = StringIO()
+        call_command('import_posts', 'posts', posts, stdout=output)
+        self.assertIn('Загружено 0 строк, пропущено 3', output.getvalue())
+
+    def import_follows(self, usernames):
+        """Загружает подписки usernames на автора, возвращает число
+        запросов к базе."""
+        for username in usernames:
+            User.objects.create_user(username=username)
+        path = os.path.join(self.directory, 'follows.jsonl')
+        with open(path, 'w', encoding='utf-8') as stream:
+            for username in usernames:
+                stream.write(
+                    f'{{"user": "{username}", "author": "author"}}\n'
+                )
+        with CaptureQueriesContext(connection) as queries:
+            call_command('import_posts', 'follows', path, stdout=StringIO())
+        return len(queries)
+
+    def test_follows_backfilled_per_chunk(self):
+        """Проверяем, что ленты новых подписчиков заполняются запросами
+        на пачку, а не на каждую подписку."""
+        few = self.import_follows(['first', 'second'])
+        many = self.import_follows([f'reader{i}' for i in range(6)])
+        self.assertEqual(few, many)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user__username='reader5').count(),
+            2,
+        )
@@ -1,10 +1,32 @@
+import json
+import re
+import tempfile
+import threading
+import time
+from http import HTTPStatus
+from io import StringIO
+from unittest import mock
+
 from django import forms
 from django.conf import settings
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.paginator import Paginator
+from django.db import connection, connections
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings,
+    skipUnlessDBFeature,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from .. import feed_cache, feeds, follow_graph, new_posts, trending
 from ..forms import PostForm
-from ..models import Comment, Follow, Group, Post, User
+from ..models import (
+    Comment, Follow, Group, Post, TimelineEntry, TrendingPost, User,
+    UserStats,
+)
+from ..utils import CursorPaginator, elided_page_range, encode_cursor
 
 
 class PostsViewsTests(TestCase):
@@ -53,7 +75,8 @@ class PostsViewsTests(TestCase):
         }
 
     def setUp(self):
-        """Авторизуем автора поста."""
+        """Очищаем кэш и авторизуем автора поста."""
+        cache.clear()
         self.authorized_author = Client()
         self.authorized_author.force_login(PostsViewsTests.user)
 
@@ -94,6 +117,66 @@ class PostsViewsTests(TestCase):
         self.assertEqual(test_comment.author, self.comment.author)
         self.assertEqual(test_comment.post, self.comment.post)
 
+    def test_post_detail_query_count(self):
+        """Проверяем, что число запросов страницы поста
+        не зависит от количества комментариев."""
+        def count_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.authorized_author.get(self.urls['post_detail'])
+            return len(queries)
+
+        queries_with_one_comment = count_queries()
+        for number in range(5):
+            commentator = User.objects.create_user(username=f'reader_{number}')
+            Comment.objects.create(
+                author=commentator, text='Комментарий', post=self.post
+            )
+        self.assertEqual(count_queries(), queries_with_one_comment)
+
+    def test_page_object_read_once(self):
+        """Проверяем, что группа и автор страницы читаются из базы
+        один раз: и для ETag, и для самой страницы."""
+        pages = {
+            self.urls['group_list']: '"posts_group"."slug" =',
+            self.urls['profile']: '"auth_user"."username" =',
+        }
+        for url, condition in pages.items():
+            with self.subTest(url=url):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    self.authorized_author.get(url)
+                lookups = [
+                    query for query in queries
+                    if condition in query['sql']
+                ]
+                self.assertEqual(len(lookups), 1)
+
+    @override_settings(COMMENTS_PER_PAGE=2)
+    def test_comments_are_paginated(self):
+        """Проверяем, что на странице поста выводятся только новые
+        комментарии, а остальные отдаются JSON-ом по курсору."""
+        Comment.objects.bulk_create(
+            Comment(author=self.user, text=f'Комментарий {i}', post=self.post)
+            for i in range(4)
+        )
+        expected = list(
+            self.post.comments.order_by('-created', '-id').values_list(
+                'id', flat=True
+            )
+        )
+        response = self.authorized_author.get(self.urls['post_detail'])
+        comments = response.context['comments']
+        self.assertEqual([comment.id for comment in comments], expected[:2])
+        url = reverse('posts:comments_list', kwargs={'post_id': self.post.id})
+        received = []
+        cursor = comments.next_cursor
+        while cursor:
+            data = self.authorized_author.get(url, {'after': cursor}).json()
+            received += [comment['id'] for comment in data['comments']]
+            cursor = data['next']
+        self.assertEqual(received, expected[2:])
+
     def test_post_create_show_correct_context(self):
         """Проверяем контекст страницы post_create."""
         form_fields = {
@@ -148,6 +231,197 @@ class PostsViewsTests(TestCase):
         self.assertEquals(content, new_content)
 
 
+class FeedCacheViewsTest(TestCase):
+    """Класс для проверки кэширования лент и карточек постов."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Добавляем во временную базу данных автора, группу и пост."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Исходный текст',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        """Очищаем кэш, создаем гостя и авторизуем автора."""
+        cache.clear()
+        self.guest = Client()
+        self.authorized_author = Client()
+        self.authorized_author.force_login(FeedCacheViewsTest.user)
+
+    def test_index_varies_by_authentication(self):
+        """Проверяем, что гость не получает страницу авторизованного."""
+        url = reverse('posts:index')
+        authorized_content = self.authorized_author.get(url).content.decode()
+        guest_content = self.guest.get(url).content.decode()
+        self.assertIn('Избранные авторы', authorized_content)
+        self.assertNotIn('Избранные авторы', guest_content)
+
+    def test_post_card_cached_until_post_changes(self):
+        """Проверяем, что карточка поста берется из кэша, пока пост
+        не изменится."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.guest.get(url)
+        Post.objects.filter(id=self.post.id).update(text='Тихая правка')
+        self.assertContains(self.guest.get(url), 'Исходный текст')
+        post = Post.objects.get(id=self.post.id)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertContains(self.guest.get(url), 'Новый текст')
+
+    def test_feeds_invalidated_on_changes(self):
+        """Проверяем, что кэш лент сбрасывается при изменении постов,
+        комментариев и групп."""
+        index_url = reverse('posts:index')
+        detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id}
+        )
+        self.guest.get(index_url)
+        self.guest.get(detail_url)
+        Post.objects.create(author=self.user, text='Свежий пост')
+        self.assertContains(self.guest.get(index_url), 'Свежий пост')
+        Comment.objects.create(
+            author=self.user, post=self.post, text='Свежий комментарий'
+        )
+        self.assertContains(self.guest.get(detail_url), 'Свежий комментарий')
+        self.group.title = 'Переименованная группа'
+        self.group.save()
+        self.assertContains(
+            self.guest.get(index_url), 'Переименованная группа'
+        )
+
+    def test_counters_invalidated(self):
+        """Проверяем, что ленты и страница поста показывают свежие
+        счетчики комментариев и подписчиков."""
+        follower = User.objects.create_user(username='follower')
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        ]
+        etags = [self.guest.get(url)['ETag'] for url in urls]
+        Comment.objects.create(author=self.user, post=self.post, text='Ого')
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.guest.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertContains(response, 'Комментариев: 1')
+        detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id}
+        )
+        etag = self.guest.get(detail_url)['ETag']
+        Follow.objects.create(user=follower, author=self.user)
+        response = self.guest.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Подписчиков автора:  <span >1</span>')
+
+    def test_comment_keeps_listing_versions(self):
+        """Проверяем, что комментарий меняет версию только страницы
+        поста, а не лент, в которых он показан."""
+        scopes = [
+            ('index',),
+            ('group', self.group.id),
+            ('profile', self.user.id),
+            ('post', self.post.id),
+        ]
+        before = feed_cache.get_versions(*scopes)
+        Comment.objects.create(author=self.user, post=self.post, text='Ого')
+        after = feed_cache.get_versions(*scopes)
+        self.assertEqual(after[:3], before[:3])
+        self.assertNotEqual(after[3], before[3])
+
+    def test_moved_post_resets_previous_group(self):
+        """Проверяем, что перенос поста в другую группу сбрасывает
+        ленту прежней группы."""
+        other = Group.objects.create(title='Другая', slug='other')
+        scope = ('group', self.group.id)
+        before = feed_cache.get_versions(scope)
+        post = Post.objects.get(id=self.post.id)
+        post.group = other
+        post.save()
+        self.assertNotEqual(feed_cache.get_versions(scope), before)
+
+    def test_follow_feed_is_fresh(self):
+        """Проверяем, что лента подписок показывает новые посты и
+        счетчики комментариев."""
+        follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=follower, author=self.user)
+        client = Client()
+        client.force_login(follower)
+        url = reverse('posts:follow_index')
+        client.get(url)
+        Post.objects.create(author=self.user, text='Для подписчиков')
+        Comment.objects.create(author=self.user, post=self.post, text='Ого')
+        response = client.get(url)
+        self.assertContains(response, 'Для подписчиков')
+        self.assertContains(response, 'Комментариев: 1')
+
+    @override_settings(REPLICA_DATABASES=['replica1'])
+    def test_version_settles_after_replica_lag(self):
+        """Проверяем, что версия ленты меняется еще раз, когда реплики
+        догонят основную базу."""
+        scope = ('group', self.group.id)
+        feed_cache.bump(scope)
+        [fresh] = feed_cache.get_versions(scope)
+        later = time.time() + settings.REPLICA_STICKY_SECONDS + 1
+        with mock.patch.object(feed_cache.time, 'time', return_value=later):
+            [settled] = feed_cache.get_versions(scope)
+        self.assertNotEqual(fresh, settled)
+        self.assertEqual(feed_cache.get_versions(scope), [fresh])
+
+    def test_fragment_key_ignores_unknown_params(self):
+        """Проверяем, что лишние параметры адреса не создают новых
+        фрагментов в кэше."""
+        url = reverse('posts:index')
+        self.guest.get(url)
+        Post.objects.filter(id=self.post.id).update(text='Тихая правка')
+        for query in ('?utm=1', '?page=1', '?page=1&x=y'):
+            with self.subTest(query=query):
+                response = self.guest.get(url + query)
+                self.assertContains(response, 'Исходный текст')
+
+    def test_conditional_get(self):
+        """Проверяем, что неизменная страница отдает 304 без запросов
+        к постам, а изменение ленты или другой пользователь - 200."""
+        # группу, автора и пост приходится найти, чтобы узнать версию
+        # ленты
+        urls_and_queries = {
+            reverse('posts:index'): 0,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}): 1,
+            reverse('posts:profile', kwargs={'username': self.user}): 1,
+            reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.id}
+            ): 1,
+        }
+        urls = list(urls_and_queries)
+        for url, queries in urls_and_queries.items():
+            with self.subTest(url=url):
+                etag = self.guest.get(url)['ETag']
+                with self.assertNumQueries(queries):
+                    response = self.guest.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+                response = self.authorized_author.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+        etags = [self.guest.get(url)['ETag'] for url in urls]
+        Comment.objects.create(author=self.user, post=self.post, text='Ого')
+        Post.objects.create(author=self.user, group=self.group, text='Еще')
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.guest.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
 class PaginatorPostViewsTest(TestCase):
     """Класс для проверки Paginator приложения posts."""
     NUMBER_OF_POSTS = 11
@@ -258,6 +532,132 @@ class PaginatorPostViewsTest(TestCase):
                         self.user_2.username,
                     )
 
+    def test_page_range_is_windowed(self):
+        """Проверяем, что навигация показывает окно страниц вокруг
+        текущей, а не все страницы."""
+        cases = {
+            1: [1, 2, 3, None, 12],
+            6: [1, None, 4, 5, 6, 7, 8, None, 12],
+            12: [1, None, 10, 11, 12],
+        }
+        for number, expected in cases.items():
+            with self.subTest(number=number):
+                page_obj = Paginator(range(12), 1).get_page(number)
+                self.assertEqual(elided_page_range(page_obj), expected)
+        with override_settings(POSTS_PER_PAGE=1):
+            response = self.authorized_author.get(
+                reverse('posts:index'), {'page': 6}
+            )
+        self.assertContains(response, 'page=8"')
+        self.assertNotContains(response, 'page=9"')
+
+    def test_infinite_scroll_fragments(self):
+        """Проверяем, что фрагменты бесконечной прокрутки отдают
+        остальные посты ленты по одному разу."""
+        response = self.authorized_author.get(reverse('posts:index'))
+        received = [post.id for post in response.context['page_obj']]
+        url = re.search(
+            r'id="more-posts".*?data-url="([^"]+)"',
+            response.content.decode(),
+            re.DOTALL,
+        ).group(1).replace('&amp;', '&')
+        while url:
+            response = self.authorized_author.get(url)
+            self.assertTemplateUsed(response, 'includes/post_cards.html')
+            received += [post.id for post in response.context['page_obj']]
+            url = response.context['more_url']
+        self.assertEqual(
+            received, list(Post.objects.order_by('-pub_date', '-id')
+                           .values_list('id', flat=True))
+        )
+
+
+@override_settings(POSTS_PAGINATION='cursor')
+class CursorPaginatorViewsTest(TestCase):
+    """Класс для проверки курсорной пагинации приложения posts."""
+    NUMBER_OF_POSTS = 23
+
+    @classmethod
+    def setUpClass(cls):
+        """Добавляем во временную базу данных автора и 23 поста."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Тестовый пост №{i}')
+            for i in range(cls.NUMBER_OF_POSTS)
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_seek_uses_feed_index(self):
+        """Проверяем, что страница по курсору читается диапазоном
+        индекса ленты без сортировки во временном B-дереве."""
+        post = Post.objects.order_by('-pub_date', '-id')[5]
+        cursor = encode_cursor(post)
+        feeds_list = {
+            'index': feeds.index_posts(),
+            'profile': feeds.profile_posts(self.user),
+        }
+        for name, queryset in feeds_list.items():
+            paginator = CursorPaginator(queryset, settings.POSTS_PER_PAGE)
+            for direction in ('after', 'before'):
+                with self.subTest(feed=name, direction=direction):
+                    plan = paginator.page_query(
+                        **{direction: cursor}
+                    ).explain()
+                    self.assertNotIn('TEMP B-TREE', plan)
+                    self.assertRegex(plan, r'pub_date_idx \(.*pub_date[<>]')
+
+    def test_explain_feeds_shows_seek_queries(self):
+        """Проверяем, что explain_feeds выводит планы страниц после и
+        перед курсором."""
+        output = StringIO()
+        call_command('explain_feeds', username='author', stdout=output)
+        for name in ('index after', 'index before', 'profile after'):
+            with self.subTest(name=name):
+                self.assertIn(f'{name}:', output.getvalue())
+        self.assertRegex(output.getvalue(), r'pub_date_idx \(.*pub_date[<>]')
+
+    def test_walking_through_pages(self):
+        """Проверяем, что переходы вперед и назад по курсору
+        выдают все посты ровно один раз и без запроса COUNT."""
+        url = reverse('posts:index')
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )
+        )
+        pages = []
+        query = ''
+        while True:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url + query)
+            self.assertFalse(
+                any('COUNT(' in item['sql'] for item in queries)
+            )
+            page_obj = response.context['page_obj']
+            pages.append([post.id for post in page_obj])
+            if not page_obj.has_next():
+                break
+            query = f'?after={page_obj.next_cursor}'
+        self.assertEqual(sum(pages, []), expected)
+        self.assertEqual(len(pages[0]), settings.POSTS_PER_PAGE)
+        response = self.client.get(
+            url + f'?before={page_obj.previous_cursor}'
+        )
+        self.assertEqual(
+            [post.id for post in response.context['page_obj']],
+            pages[-2],
+        )
+
+    def test_broken_cursor_opens_first_page(self):
+        """Проверяем, что поврежденный курсор открывает первую страницу."""
+        response = self.client.get(reverse('posts:index') + '?after=xyz')
+        page_obj = response.context['page_obj']
+        self.assertFalse(page_obj.has_previous())
+        self.assertEqual(len(page_obj), settings.POSTS_PER_PAGE)
+
 
 class FollowViewsTest(TestCase):
     """Класс для проверки подписок на авторов приложения posts."""
@@ -329,6 +729,104 @@ class FollowViewsTest(TestCase):
                     len(user.get(url).context['page_obj']),
                     count)
 
+    def test_follow_is_idempotent(self):
+        """Проверяем, что повторные подписка и отписка ничего не меняют,
+        а скриптам отвечают JSON и 204."""
+        follow_url = reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author}
+        )
+        unfollow_url = reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author}
+        )
+        follows = Follow.objects.filter(
+            user=FollowViewsTest.client, author=self.author
+        )
+        for status in (201, 200):
+            with self.subTest(status=status):
+                response = self.authorized_client.get(
+                    follow_url, HTTP_ACCEPT='application/json'
+                )
+                self.assertEqual(response.status_code, status)
+                self.assertEqual(response.json(), {'following': True})
+                self.assertEqual(follows.count(), 1)
+        self.assertRedirects(
+            self.authorized_client.get(follow_url),
+            reverse('posts:profile', kwargs={'username': self.author}),
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1
+        )
+        for _ in range(2):
+            response = self.authorized_client.get(
+                unfollow_url, HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+            )
+            self.assertEqual(response.status_code, 204)
+            self.assertFalse(follows.exists())
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 0
+        )
+
+    def test_timeline_fan_out(self):
+        """Проверяем, что лента подписок заполняется при подписке
+        и новом посте и очищается при отписке."""
+        follow_url = reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author}
+        )
+        self.authorized_client.get(follow_url)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        timeline = TimelineEntry.objects.filter(user=FollowViewsTest.client)
+        self.assertEqual(
+            set(timeline.values_list('post_id', flat=True)),
+            {self.post.id, new_post.id},
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], new_post)
+        unfollow_url = reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author}
+        )
+        self.authorized_client.get(unfollow_url)
+        self.assertFalse(timeline.exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_timeline_fan_out_on_read(self):
+        """Проверяем, что посты популярных авторов не раскладываются
+        по лентам, но попадают в ленту подписок при чтении."""
+        Follow.objects.create(user=FollowViewsTest.client, author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_celebrity_posts_kept_below_limit(self):
+        """Проверяем, что пост, опубликованный сверх лимита подписчиков,
+        остается в ленте, когда подписчиков стало меньше лимита."""
+        Follow.objects.create(user=FollowViewsTest.client, author=self.author)
+        post = Post.objects.create(author=self.author, text='Для многих')
+        self.assertFalse(Post.objects.get(id=post.id).fanned_out)
+        with override_settings(TIMELINE_FANOUT_LIMIT=10):
+            response = self.authorized_client.get(
+                reverse('posts:follow_index')
+            )
+        self.assertIn(post, response.context['page_obj'])
+
+    @override_settings(TIMELINE_LENGTH=2)
+    def test_timeline_trimmed_on_fan_out(self):
+        """Проверяем, что лента подписок обрезается после нового поста."""
+        Follow.objects.create(user=FollowViewsTest.client, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+            for number in range(3)
+        ]
+        timeline = TimelineEntry.objects.filter(user=FollowViewsTest.client)
+        self.assertEqual(
+            set(timeline.values_list('post_id', flat=True)),
+            {post.id for post in posts[1:]},
+        )
+
     def test_following_for_guests(self):
         """Проверяем, что неаворизованный пользователь не может подписаться"""
         url = reverse(
@@ -338,3 +836,390 @@ class FollowViewsTest(TestCase):
         redirect_url = f'/auth/login/?next=/profile/{self.author}/follow/'
         response = self.guest.get(url)
         self.assertRedirects(response, redirect_url)
+
+
+class SearchViewsTest(TestCase):
+    """Класс для проверки поиска по постам."""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='author')
+        self.post = Post.objects.create(
+            author=self.user, text='Прогулка по осеннему лесу'
+        )
+        self.other = Post.objects.create(
+            author=self.user, text='Рецепт яблочного пирога'
+        )
+
+    def found(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return [post.id for post in response.context['page_obj']]
+
+    def test_search_uses_index(self):
+        """Проверяем, что поиск находит посты по словам и префиксу."""
+        self.assertEqual(self.found('лесу'), [self.post.id])
+        self.assertEqual(self.found('Рецепт ябл'), [self.other.id])
+        self.assertEqual(self.found('рецепт лесу'), [])
+        self.assertEqual(self.found('"OR *'), [])
+        self.assertEqual(self.found(''), [])
+
+    def test_search_finds_word_forms(self):
+        """Проверяем, что поиск не зависит от формы слова и от «ё»."""
+        post = Post.objects.create(
+            author=self.user, text='Зелёные ёлки у самой дороги'
+        )
+        self.assertEqual(self.found('лес'), [self.post.id])
+        self.assertEqual(self.found('осенний'), [self.post.id])
+        self.assertEqual(self.found('пироги'), [self.other.id])
+        self.assertEqual(self.found('зеленая елка'), [post.id])
+        self.assertEqual(self.found('ДОРОГА'), [post.id])
+
+    def test_index_follows_post_changes(self):
+        """Проверяем, что индекс обновляется при редактировании
+        и удалении поста."""
+        self.post.text = 'Прогулка по парку'
+        self.post.save()
+        self.assertEqual(self.found('лесу'), [])
+        self.assertEqual(self.found('парку'), [self.post.id])
+        self.post.delete()
+        self.assertEqual(self.found('парку'), [])
+
+
+class BenchmarkCommandTest(TestCase):
+    """Класс для проверки команды benchmark."""
+
+    def test_benchmark_reports_all_views(self):
+        """Проверяем, что benchmark заполняет базу и измеряет все ленты."""
+        output = StringIO()
+        call_command(
+            'benchmark', users=5, groups=2, posts=15, comments=10,
+            follows=10, pages=[1, 2], repeat=2, current_db=True,
+            stdout=output,
+        )
+        report = json.loads(output.getvalue())
+        self.assertEqual(report['dataset']['posts'], 15)
+        self.assertEqual(
+            {result['view'] for result in report['results']},
+            {'index', 'group_posts', 'profile', 'follow_index',
+             'post_detail'},
+        )
+        for result in report['results']:
+            with self.subTest(url=result['url'], cache=result['cache']):
+                self.assertGreater(result['bytes'], 0)
+                self.assertGreaterEqual(
+                    result['latency_ms']['p99'], result['latency_ms']['p50']
+                )
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class FollowConcurrencyTest(TransactionTestCase):
+    """Класс для проверки одновременных подписок и отписок.
+
+    Тестовая база SQLite в памяти не поддерживает запись из нескольких
+    соединений, поэтому тест выполняется только на других СУБД.
+    """
+
+    THREADS = 8
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+
+    def hammer(self, func):
+        """Вызывает func(reader, author) одновременно из нескольких
+        потоков и возвращает результаты."""
+        barrier = threading.Barrier(self.THREADS)
+        results = []
+        errors = []
+
+        def worker():
+            barrier.wait()
+            try:
+                results.append(func(self.reader.id, self.author.id))
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=worker) for _ in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def test_concurrent_follow_and_unfollow(self):
+        """Проверяем, что одновременные подписки создают одну подписку,
+        а счетчики не расходятся с данными."""
+        stats = UserStats.objects.filter(user=self.author)
+        results = self.hammer(follow_graph.follow)
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(stats.get().followers_count, 1)
+        results = self.hammer(follow_graph.unfollow)
+        self.assertEqual(results.count(True), 1)
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(stats.get().followers_count, 0)
+
+
+class FollowGraphTest(TestCase):
+    """Класс для проверки кэша подписок posts.follow_graph."""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(3)
+        ]
+
+    def test_following_set_is_cached_and_invalidated(self):
+        """Проверяем, что подписки читаются из кэша и сбрасываются
+        при подписке и отписке."""
+        self.assertEqual(follow_graph.following_ids(self.reader.id), set())
+        follow = Follow.objects.create(
+            user=self.reader, author=self.authors[1]
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                follow_graph.following_ids(self.reader.id),
+                {self.authors[1].id},
+            )
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                follow_graph.is_following(self.reader.id, self.authors[1].id)
+            )
+        follow.delete()
+        self.assertFalse(
+            follow_graph.is_following(self.reader.id, self.authors[1].id)
+        )
+        self.assertEqual(follow_graph.following_ids(None), frozenset())
+
+    def test_lru_is_bounded(self):
+        """Проверяем, что LRU вытесняет давно не читанные ключи."""
+        lru = follow_graph.LRUCache(maxsize=2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual(len(lru), 2)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('a'), 1)
+
+
+class RecommendationsTest(TestCase):
+    """Класс для проверки рекомендаций «кого почитать»."""
+
+    def setUp(self):
+        cache.clear()
+        self.users = {
+            name: User.objects.create_user(username=name)
+            for name in ('reader', 'friend', 'author', 'twin', 'other')
+        }
+        for user, author in (
+            ('reader', 'friend'),
+            ('friend', 'author'),
+            ('twin', 'friend'),
+            ('twin', 'other'),
+        ):
+            Follow.objects.create(
+                user=self.users[user], author=self.users[author]
+            )
+        self.client = Client()
+        self.client.force_login(self.users['reader'])
+
+    def test_recommendations_on_follow_page(self):
+        """Проверяем, что рекомендуются друзья друзей и авторы похожих
+        читателей, а после подписки автор пропадает из рекомендаций."""
+        call_command('compute_recommendations', stdout=StringIO())
+        response = self.client.get(reverse('posts:follow_index'))
+        recommended = response.context['recommended_authors']
+        self.assertEqual(
+            recommended[:2], [self.users['author'], self.users['other']]
+        )
+        self.assertNotIn(self.users['friend'], recommended)
+        self.assertNotIn(self.users['reader'], recommended)
+        self.assertContains(response, 'Кого почитать')
+        Follow.objects.create(
+            user=self.users['reader'], author=self.users['author']
+        )
+        response = self.client.get(
+            reverse('posts:profile', args=('other',))
+        )
+        recommended = response.context['recommended_authors']
+        self.assertNotIn(self.users['author'], recommended)
+        self.assertNotIn(self.users['other'], recommended)
+
+
+class TrendingViewsTest(TransactionTestCase):
+    """Класс для проверки популярных постов и групп."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.old = Post.objects.create(
+            author=self.user, group=self.group, text='Старое обсуждение'
+        )
+        self.new = Post.objects.create(author=self.user, text='Новое')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_trending_ranks_by_decayed_comments(self):
+        """Проверяем, что недавние комментарии весят больше старых."""
+        now = time.time()
+        day_ago = now - settings.TRENDING_HALF_LIFE * 4
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with override_settings(CACHES={'default': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': cache_dir,
+            }}):
+                for _ in range(3):
+                    trending.record(self.old.id, self.group.id, now=day_ago)
+                for _ in range(2):
+                    trending.record(self.new.id, None, now=now)
+                call_command('materialize_trending', stdout=StringIO())
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(
+            list(response.context['page_obj']), [self.new, self.old]
+        )
+        self.assertEqual(list(response.context['groups']), [self.group])
+
+    def test_command_requires_shared_cache(self):
+        """Проверяем, что команда не стирает популярное, когда журнал
+        хранится в памяти другого процесса."""
+        trending.record(self.old.id, self.group.id)
+        trending.materialize()
+        with self.assertRaises(CommandError):
+            call_command('materialize_trending', stdout=StringIO())
+        self.assertEqual(TrendingPost.objects.count(), 1)
+
+    def test_comments_are_recorded(self):
+        """Проверяем, что комментарии попадают в журнал, а страница
+        обновляется после пересчета."""
+        self.assertContains(
+            self.client.get(reverse('posts:trending')),
+            'Пока ничего не обсуждают',
+        )
+        self.client.post(
+            reverse('posts:add_comment', args=(self.old.id,)),
+            {'text': 'Комментарий'},
+        )
+        trending.materialize()
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(list(response.context['page_obj']), [self.old])
+
+
+class NewPostsPollTest(TransactionTestCase):
+    """Класс для проверки уведомлений о новых постах."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Group.objects.create(title='Другая', slug='other', description='')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.url = reverse('posts:new_posts')
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def poll(self, **params):
+        return self.client.get(self.url, params).json()
+
+    def test_new_posts_by_feed(self):
+        """Проверяем, что лента получает id только своих новых постов."""
+        since = self.poll()['last']
+        stranger = User.objects.create_user(username='stranger')
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Новый пост'
+        )
+        other = Post.objects.create(author=stranger, text='Чужой пост')
+        cases = (
+            ({'feed': 'index'}, [post.id, other.id]),
+            ({'feed': 'follow'}, [post.id]),
+            ({'feed': 'group', 'slug': 'group'}, [post.id]),
+            ({'feed': 'group', 'slug': 'other'}, []),
+        )
+        for params, expected in cases:
+            with self.subTest(params=params):
+                data = self.poll(since=since, **params)
+                self.assertEqual(data['posts'], expected)
+                self.assertEqual(data['last'], since + 2)
+                self.assertFalse(data['reset'])
+        self.assertEqual(
+            self.client.get(self.url, {'feed': 'unknown'}).status_code,
+            HTTPStatus.BAD_REQUEST,
+        )
+
+    def test_poll_does_not_wait(self):
+        """Проверяем, что опрос отвечает сразу и говорит, когда
+        спросить снова."""
+        since = self.poll()['last']
+        started = time.monotonic()
+        response = self.client.get(self.url, {'since': since})
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(response.json()['posts'], [])
+        self.assertEqual(
+            response['Retry-After'], str(settings.NEW_POSTS_POLL_INTERVAL)
+        )
+
+    def test_new_post_cards(self):
+        """Проверяем, что клиент загружает карточки только новых
+        постов своей ленты."""
+        since = self.poll()['last']
+        stranger = User.objects.create_user(username='stranger')
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        other = Post.objects.create(author=stranger, text='Чужой пост')
+        ids = self.poll(since=since, feed='index')['posts']
+        self.assertEqual(ids, [post.id, other.id])
+        response = self.client.get(reverse('posts:post_cards'), {
+            'feed': 'follow', 'ids': ','.join(map(str, ids)),
+        })
+        self.assertEqual(list(response.context['page_obj']), [post])
+        self.assertContains(response, 'Новый пост')
+        self.assertNotContains(response, 'data-more-url')
+
+    @override_settings(NEW_POSTS_BACKLOG=1)
+    def test_stale_client_is_reset(self):
+        since = self.poll()['last']
+        for number in range(2):
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+        self.assertTrue(self.poll(since=since)['reset'])
+        self.assertTrue(self.poll(since=-1)['reset'])
+
+    def test_taken_number_is_not_overwritten(self):
+        """Проверяем, что событие с уже занятым номером (неатомарный
+        incr) записывается под следующим номером."""
+        new_posts.publish(1, self.author.id, None)
+        cache.set(new_posts.LAST_KEY, 0, None)
+        new_posts.publish(2, self.author.id, None)
+        events, last = new_posts.events(0, new_posts.last_number())
+        self.assertEqual([event[0] for event in events], [1, 2])
+        self.assertEqual(last, 2)
+
+    @override_settings(NEW_POSTS_PENDING=2)
+    def test_lost_event_is_skipped(self):
+        """Проверяем, что истекшее событие не останавливает ленту,
+        а недописанное в конце журнала - останавливает."""
+        since = self.poll()['last']
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+            for number in range(4)
+        ]
+        cache.delete(f'new_posts:{since + 1}')
+        data = self.poll(since=since)
+        self.assertEqual(data['posts'], [post.id for post in posts[1:]])
+        self.assertEqual(data['last'], since + 4)
+        cache.delete(f'new_posts:{since + 4}')
+        data = self.poll(since=since + 2)
+        self.assertEqual(data['posts'], [posts[2].id])
+        self.assertEqual(data['last'], since + 3)
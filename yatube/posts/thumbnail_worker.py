@@ -0,0 +1,22 @@
+"""Точка входа процессов генерации миниатюр.
+
+Модуль не импортирует Django и модели при загрузке: дочерний процесс
+сначала выполняет django.setup() в init, а затем run.
+"""
+import os
+
+
+def init(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def run(name):
+    from django.db import connections
+
+    from posts.thumbnails import generate
+    try:
+        return generate(name)
+    finally:
+        connections.close_all()
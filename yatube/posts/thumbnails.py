@@ -0,0 +1,208 @@
+"""Фоновая генерация миниатюр изображений постов.
+
+Для каждого изображения создается набор миниатюр: несколько ширин
+(settings.POST_IMAGE_WIDTHS) в JPEG и в современных форматах
+(settings.POST_IMAGE_FORMATS), из которых шаблон собирает <picture>
+со srcset. Миниатюры создаются после сохранения изображения в пуле
+процессов, а шаблоны только ищут готовые и никогда не ждут генерации.
+Если пул процессов недоступен или THUMBNAIL_WORKERS = 0, генерация
+идет в фоновом потоке текущего процесса.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import (
+    BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor,
+)
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import thumbnail_worker
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pending = set()
+_executor = None
+
+
+class PostThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl, умеющий искать миниатюру без ее генерации."""
+
+    def get_options(self, source, options):
+        """Дополняет options так же, как это делает get_thumbnail,
+        чтобы имя миниатюры совпало со сгенерированной."""
+        options = dict(options)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def lookup(self, file_, geometry_string, **options):
+        """Возвращает готовую миниатюру или None."""
+        source = ImageFile(file_)
+        options = self.get_options(source, options)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = PostThumbnailBackend()
+
+
+def modern_formats():
+    """Форматы из POST_IMAGE_FORMATS, которые умеют сохранять
+    установленные Pillow и sorl-thumbnail."""
+    Image.init()
+    return [
+        format_ for format_ in settings.POST_IMAGE_FORMATS
+        if format_ in EXTENSIONS and format_ in Image.SAVE
+    ]
+
+
+def geometry(width):
+    ratio_width, ratio_height = settings.POST_IMAGE_RATIO
+    return f'{width}x{round(width * ratio_height / ratio_width)}'
+
+
+def variants():
+    """Все стандартные миниатюры: (формат, ширина, geometry, options).
+
+    Формат None - формат sorl по умолчанию (JPEG) для браузеров,
+    не поддерживающих современные форматы.
+    """
+    for format_ in (*modern_formats(), None):
+        for width in settings.POST_IMAGE_WIDTHS:
+            options = dict(settings.POST_IMAGE_OPTIONS)
+            if format_:
+                options['format'] = format_
+            yield format_, width, geometry(width), options
+
+
+def _srcset(thumbnails):
+    return ', '.join(f'{im.url} {width}w' for width, im in thumbnails)
+
+
+def ready_picture(image):
+    """Готовые миниатюры изображения поста для тега <picture>
+    или None, пока не готова ни одна миниатюра в JPEG."""
+    if not image:
+        return None
+    ready = {}
+    try:
+        for format_, width, size, options in variants():
+            im = backend.lookup(image.name, size, **options)
+            if im is not None:
+                ready.setdefault(format_, []).append((width, im))
+    except (DatabaseError, OSError):
+        logger.exception('Не удалось найти миниатюры %s', image.name)
+        return None
+    fallback = ready.pop(None, None)
+    if not fallback:
+        return None
+    width, im = fallback[-1]
+    return {
+        'sources': [
+            {
+                'type': Image.MIME.get(format_, f'image/{format_.lower()}'),
+                'srcset': _srcset(thumbnails),
+            }
+            for format_, thumbnails in ready.items()
+        ],
+        'src': im.url,
+        'srcset': _srcset(fallback),
+        'sizes': settings.POST_IMAGE_SIZES,
+        'width': im.width,
+        'height': im.height,
+    }
+
+
+def missing(name):
+    """Есть ли у изображения name несозданные миниатюры."""
+    return any(
+        backend.lookup(name, size, **options) is None
+        for format_, width, size, options in variants()
+    )
+
+
+def generate(name):
+    """Создает все стандартные миниатюры изображения name.
+
+    Возвращает True, если все миниатюры готовы.
+    """
+    ready = True
+    for format_, width, size, options in variants():
+        backend.get_thumbnail(name, size, **options)
+        if backend.lookup(name, size, **options) is None:
+            ready = False
+    return ready
+
+
+def _create_executor():
+    if settings.THUMBNAIL_WORKERS:
+        try:
+            return ProcessPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=thumbnail_worker.init,
+                initargs=(os.environ['DJANGO_SETTINGS_MODULE'],),
+            )
+        except (OSError, ValueError, NotImplementedError):
+            logger.exception('Пул процессов для миниатюр недоступен')
+    return _local_executor()
+
+
+def _local_executor():
+    return ThreadPoolExecutor(max_workers=1)
+
+
+def _done(name, future):
+    with _lock:
+        _pending.discard(name)
+    try:
+        ready = future.result()
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', name)
+        return
+    if not ready:
+        return
+    try:
+        # Сохранение меняет Post.updated и сбрасывает кэш лент,
+        # в которых вместо изображения была заглушка.
+        for post in Post.objects.filter(image=name):
+            post.save(update_fields=('updated',))
+    except DatabaseError:
+        logger.exception('Не удалось обновить посты с изображением %s', name)
+    finally:
+        connections.close_all()
+
+
+def schedule(name):
+    """Ставит генерацию миниатюр изображения name в очередь."""
+    global _executor
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+        if _executor is None:
+            _executor = _create_executor()
+        try:
+            future = _executor.submit(thumbnail_worker.run, name)
+        except (BrokenExecutor, RuntimeError, OSError):
+            logger.exception('Пул процессов для миниатюр сломан')
+            _executor = _local_executor()
+            future = _executor.submit(thumbnail_worker.run, name)
+    future.add_done_callback(lambda future: _done(name, future))
@@ -0,0 +1,131 @@
+"""Материализованная лента подписок (fan-out-on-write).
+
+Новый пост сразу раскладывается в ленты подписчиков автора, поэтому
+страница подписок читается одним диапазоном по индексу
+(user, -pub_date). Посты авторов с очень большим числом подписчиков
+не раскладываются, а подмешиваются при чтении (fan-out-on-read). Такие
+посты отмечаются Post.fanned_out=False и подмешиваются, даже если
+подписчиков у автора потом стало меньше лимита.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import OuterRef, Q, Subquery
+
+from .models import Follow, Post, TimelineEntry, User, UserStats
+
+
+def celebrity_ids(author_ids):
+    """Возвращает id авторов, у которых подписчиков больше лимита."""
+    return set(
+        UserStats.objects.filter(
+            user_id__in=author_ids,
+            followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+        ).values_list('user_id', flat=True)
+    )
+
+
+def fan_out(post):
+    """Раскладывает новый пост в ленты подписчиков автора."""
+    if celebrity_ids([post.author_id]):
+        post.fanned_out = False
+        Post.objects.filter(id=post.id).update(fanned_out=False)
+        return
+    follower_ids = list(
+        Follow.objects.filter(author_id=post.author_id).values_list(
+            'user_id', flat=True
+        )
+    )
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in follower_ids
+        ),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    for start in range(0, len(follower_ids), settings.TIMELINE_BATCH_SIZE):
+        trim(*follower_ids[start:start + settings.TIMELINE_BATCH_SIZE])
+
+
+def mark_not_fanned_out(post_ids):
+    """Отмечает посты авторов сверх лимита подписчиков (импорт постов
+    без сигналов)."""
+    posts = Post.objects.filter(id__in=post_ids)
+    authors = posts.values_list('author_id', flat=True).distinct()
+    posts.filter(author_id__in=celebrity_ids(authors)).update(
+        fanned_out=False
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту пользователя последние посты нового автора."""
+    backfill_follows(
+        Follow.objects.filter(user_id=user_id, author_id=author_id)
+    )
+
+
+def backfill_follows(follows):
+    """Добавляет в ленты подписчиков последние посты авторов подписок
+    follows одним INSERT ... SELECT и обрезает эти ленты."""
+    latest = Post.objects.filter(author_id=OuterRef('author_id')).values(
+        'id'
+    )[:settings.TIMELINE_LENGTH]
+    rows = follows.exclude(
+        author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).filter(author__posts__in=Subquery(latest)).order_by().values_list(
+        'user_id', 'author__posts__id', 'author__posts__pub_date'
+    )
+    select, params = rows.query.sql_with_params()
+    ops = connection.ops
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{ops.insert_statement(ignore_conflicts=True)} '
+            f'{TimelineEntry._meta.db_table} (user_id, post_id, pub_date) '
+            f'{select} {ops.ignore_conflicts_suffix_sql(True)}',
+            params,
+        )
+    user_ids = sorted(set(follows.values_list('user_id', flat=True)))
+    for start in range(0, len(user_ids), settings.TIMELINE_BATCH_SIZE):
+        trim(*user_ids[start:start + settings.TIMELINE_BATCH_SIZE])
+
+
+def remove(user_id, author_id):
+    """Убирает из ленты пользователя посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def trim(*user_ids):
+    """Оставляет в лентах пользователей только TIMELINE_LENGTH последних
+    записей: один запрос находит границы лент, второй удаляет лишнее."""
+    oldest_kept = TimelineEntry.objects.filter(
+        user_id=OuterRef('id')
+    ).values('pub_date')[
+        settings.TIMELINE_LENGTH - 1:settings.TIMELINE_LENGTH
+    ]
+    bounds = User.objects.filter(id__in=user_ids).annotate(
+        oldest_kept=Subquery(oldest_kept)
+    ).filter(oldest_kept__isnull=False).values_list('id', 'oldest_kept')
+    condition = Q()
+    for user_id, pub_date in bounds:
+        condition |= Q(user_id=user_id, pub_date__lt=pub_date)
+    if condition:
+        TimelineEntry.objects.filter(condition).delete()
+
+
+def timeline_posts(user):
+    """Посты ленты подписок пользователя."""
+    followed = Follow.objects.filter(user=user).values_list(
+        'author_id', flat=True
+    )
+    celebrities = celebrity_ids(followed)
+    not_fanned_out = Q(author_id__in=followed, fanned_out=False)
+    if not celebrities and not Post.objects.filter(not_fanned_out).exists():
+        return Post.objects.filter(timeline_entries__user=user).order_by(
+            '-timeline_entries__pub_date'
+        )
+    entries = TimelineEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(
+        Q(id__in=entries) | Q(author_id__in=celebrities) | not_fanned_out
+    )
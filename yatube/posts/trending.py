@@ -0,0 +1,124 @@
+"""Популярные посты и группы по скорости комментирования.
+
+Каждый новый комментарий записывается в журнал событий в кэше:
+время делится на интервалы по TRENDING_SLOT_SECONDS, в каждом
+интервале есть счетчик событий (атомарный incr) и по ключу на событие
+с парой (id поста, id группы). Команда materialize_trending читает
+журнал за последние TRENDING_WINDOW_SLOTS интервалов, считает оценки с
+экспоненциальным затуханием (вес интервала уменьшается вдвое каждые
+TRENDING_HALF_LIFE секунд) и сохраняет лучшие посты и группы в таблицы
+TrendingPost и TrendingGroup, из которых читает страница /trending/.
+"""
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Group, Post, TrendingGroup, TrendingPost
+
+
+def current_slot(now=None):
+    return int((now or time.time()) // settings.TRENDING_SLOT_SECONDS)
+
+
+def _timeout():
+    return settings.TRENDING_SLOT_SECONDS * (
+        settings.TRENDING_WINDOW_SLOTS + 1
+    )
+
+
+def _counter_key(slot):
+    return f'trending:{slot}'
+
+
+def _event_key(slot, index):
+    return f'trending:{slot}:{index}'
+
+
+def _next_index(key):
+    cache.add(key, 0, _timeout())
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Счетчик вытеснен из кэша между add и incr.
+        cache.set(key, 1, _timeout())
+        return 1
+
+
+def record(post_id, group_id, now=None):
+    """Учитывает новый комментарий к посту post_id."""
+    slot = current_slot(now)
+    key = _counter_key(slot)
+    event = (post_id, group_id)
+    # incr атомарен не во всех бэкендах кэша, и номер мог достаться
+    # параллельному комментарию: тогда берем следующий.
+    while not cache.add(_event_key(slot, _next_index(key)), event,
+                        _timeout()):
+        pass
+
+
+def events(slot):
+    """События интервала slot: список пар (id поста, id группы)."""
+    total = cache.get(_counter_key(slot)) or 0
+    found = []
+    for start in range(1, total + 1, 1000):
+        keys = [
+            _event_key(slot, index)
+            for index in range(start, min(start + 1000, total + 1))
+        ]
+        found.extend(cache.get_many(keys).values())
+    return found
+
+
+def scores(now=None):
+    """Оценки постов и групп с затуханием по возрасту интервала."""
+    now = now or time.time()
+    last = current_slot(now)
+    post_scores = defaultdict(float)
+    group_scores = defaultdict(float)
+    for slot in range(last - settings.TRENDING_WINDOW_SLOTS + 1, last + 1):
+        age = now - (slot + 1) * settings.TRENDING_SLOT_SECONDS
+        weight = 0.5 ** (max(age, 0) / settings.TRENDING_HALF_LIFE)
+        for post_id, group_id in events(slot):
+            post_scores[post_id] += weight
+            if group_id is not None:
+                group_scores[group_id] += weight
+    return post_scores, group_scores
+
+
+def _top(scores, size):
+    return sorted(scores.items(), key=lambda item: -item[1])[:size]
+
+
+def _existing(model, ranked):
+    """Оставляет в ranked только существующие объекты: пост или
+    группу могли удалить после комментария."""
+    ids = set(
+        model.objects.filter(
+            id__in=[object_id for object_id, score in ranked]
+        ).values_list('id', flat=True)
+    )
+    return [(object_id, score) for object_id, score in ranked
+            if object_id in ids]
+
+
+def materialize(now=None):
+    """Сохраняет лучшие посты и группы в таблицы популярного,
+    возвращает число сохраненных постов и групп."""
+    post_scores, group_scores = scores(now)
+    posts = _existing(Post, _top(post_scores, settings.TRENDING_SIZE))
+    groups = _existing(Group, _top(group_scores, settings.TRENDING_SIZE))
+    with transaction.atomic():
+        TrendingPost.objects.all().delete()
+        TrendingGroup.objects.all().delete()
+        TrendingPost.objects.bulk_create(
+            TrendingPost(post_id=post_id, score=score)
+            for post_id, score in posts
+        )
+        TrendingGroup.objects.bulk_create(
+            TrendingGroup(group_id=group_id, score=score)
+            for group_id, score in groups
+        )
+    return len(posts), len(groups)
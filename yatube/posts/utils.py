@@ -1,9 +1,210 @@
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+CURSOR_SEPARATOR = '|'
+POST_ORDERING = ('-pub_date', '-id')
+
+
+def encode_cursor(obj, ordering=POST_ORDERING):
+    """Курсор записи obj: значения полей сортировки в base64."""
+    values = (str(getattr(obj, field.lstrip('-'))) for field in ordering)
+    return urlsafe_base64_encode(force_bytes(CURSOR_SEPARATOR.join(values)))
+
+
+class CursorPage(Page):
+    """Страница курсорной пагинации без номера и общего количества."""
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None, number=None):
+        super().__init__(object_list, number, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage {self.number or self.previous_cursor}>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def next_page_number(self):
+        return None
+
+    def previous_page_number(self):
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу сортировки (keyset pagination).
+
+    Вместо OFFSET и COUNT(*) страницы выбираются условием WHERE
+    по значениям полей сортировки последней записи предыдущей страницы,
+    поэтому глубокие страницы читаются так же быстро, как первая.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, ordering=POST_ORDERING):
+        self.ordering = tuple(ordering)
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+
+    def encode_cursor(self, obj):
+        return encode_cursor(obj, self.ordering)
+
+    def decode_cursor(self, cursor):
+        """Возвращает значения полей сортировки или None,
+        если курсор поврежден."""
+        try:
+            values = force_str(urlsafe_base64_decode(cursor)).split(
+                CURSOR_SEPARATOR
+            )
+        except (TypeError, ValueError):
+            return None
+        if len(values) != len(self.ordering):
+            return None
+        model = self.object_list.model
+        try:
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (FieldDoesNotExist, ValidationError):
+            return None
+
+    def _seek(self, values, forward):
+        """Строит условие «после» (или «до») записи с ключом values.
+
+        Для сортировки (-a, -b) условие «после» выглядит как
+        a <= x AND (a < x OR b < y): первое поле ограничено одним
+        диапазоном, и база читает индекс сортировки с места курсора,
+        а не объединяет отдельные выборки с сортировкой результата.
+        """
+        condition = None
+        for field, value in reversed(list(zip(self.ordering, values))):
+            name = field.lstrip('-')
+            descending = field.startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            beyond = Q(**{f'{name}__{lookup}': value})
+            if condition is None:
+                condition = beyond
+            else:
+                condition = (
+                    Q(**{f'{name}__{lookup}e': value}) & (beyond | condition)
+                )
+        return condition
+
+    def get_page(self, after=None, before=None):
+        """Возвращает страницу после курсора after или перед before.
+        Некорректный курсор открывает первую страницу."""
+        if before:
+            values = self.decode_cursor(before)
+            if values is not None:
+                return self._page_before(values)
+        if after:
+            values = self.decode_cursor(after)
+            if values is not None:
+                return self._page_after(values)
+        return self._page_after(None)
+
+    def _after(self, values):
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, forward=True))
+        return queryset[:self.per_page + 1]
+
+    def _before(self, values):
+        reverse_ordering = [
+            field[1:] if field.startswith('-') else f'-{field}'
+            for field in self.ordering
+        ]
+        return self.object_list.filter(
+            self._seek(values, forward=False)
+        ).order_by(*reverse_ordering)[:self.per_page + 1]
+
+    def page_query(self, after=None, before=None):
+        """Невыполненный запрос страницы после курсора after или перед
+        before: по нему explain_feeds показывает план."""
+        if before:
+            return self._before(self.decode_cursor(before))
+        return self._after(self.decode_cursor(after) if after else None)
+
+    def _page_after(self, values):
+        objects = list(self._after(values))
+        has_next = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        return CursorPage(
+            objects,
+            self,
+            next_cursor=(
+                self.encode_cursor(objects[-1]) if has_next else None
+            ),
+            previous_cursor=(
+                self.encode_cursor(objects[0])
+                if values is not None and objects else None
+            ),
+            number=1 if values is None else None,
+        )
+
+    def _page_before(self, values):
+        objects = list(self._before(values))
+        has_previous = len(objects) > self.per_page
+        objects = objects[:self.per_page][::-1]
+        if not has_previous:
+            return self._page_after(None)
+        return CursorPage(
+            objects,
+            self,
+            next_cursor=self.encode_cursor(objects[-1]),
+            previous_cursor=self.encode_cursor(objects[0]),
+        )
+
+
+def elided_page_range(page_obj, on_each_side=2, on_ends=1):
+    """Номера страниц для навигации: on_each_side страниц вокруг
+    текущей и on_ends по краям, пропуски между ними - None.
+
+    Число ссылок не зависит от количества страниц (в Django 2.2 еще
+    нет Paginator.get_elided_page_range).
+    """
+    number = page_obj.number
+    num_pages = page_obj.paginator.num_pages
+    if num_pages <= (on_each_side + on_ends) * 2:
+        return list(range(1, num_pages + 1))
+    pages = []
+    if number > 1 + on_each_side + on_ends + 1:
+        pages.extend(range(1, on_ends + 1))
+        pages.append(None)
+        pages.extend(range(number - on_each_side, number + 1))
+    else:
+        pages.extend(range(1, number + 1))
+    if number < num_pages - on_each_side - on_ends - 1:
+        pages.extend(range(number + 1, number + on_each_side + 1))
+        pages.append(None)
+        pages.extend(range(num_pages - on_ends + 1, num_pages + 1))
+    else:
+        pages.extend(range(number + 1, num_pages + 1))
+    return pages
 
 
 def paginator(request, post_list):
+    if settings.POSTS_PAGINATION == 'cursor':
+        return CursorPaginator(post_list, settings.POSTS_PER_PAGE).get_page(
+            request.GET.get('after'), request.GET.get('before')
+        )
     paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+def wants_json(request):
+    """Запрос отправлен скриптом и ждет JSON, а не HTML-страницу."""
+    return request.is_ajax() or (
+        'application/json' in request.META.get('HTTP_ACCEPT', '')
+    )
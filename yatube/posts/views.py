@@ -1,61 +1,319 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
+from . import (
+    feed_cache, feeds, follow_graph, new_posts, recommendations, search,
+)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import paginator
+from .models import Group, Post, User
+from .utils import CursorPaginator, paginator, wants_json
 
+# Страницы лент проверяются браузером при каждом открытии: если версии
+# ленты не менялись, ответ 304 отдается без запросов к постам и
+# рендеринга шаблона.
+revalidate = cache_control(private=True, no_cache=True)
 
+
+def _index_etag(request):
+    return feed_cache.etag(
+        request, ('index',), feed_cache.COMMENTS, user=True
+    )
+
+
+def _page_object(request, queryset, **lookup):
+    """Группа или автор страницы, найденные один раз за запрос: их
+    читают и функция ETag, и сама view-функция."""
+    found = request.__dict__.setdefault('_page_objects', {})
+    key = (queryset.model, tuple(lookup.items()))
+    if key not in found:
+        found[key] = queryset.filter(**lookup).first()
+    return found[key]
+
+
+def _page_group(request, slug):
+    return _page_object(request, Group.objects.all(), slug=slug)
+
+
+def _page_author(request, username):
+    return _page_object(
+        request, User.objects.select_related('stats'), username=username
+    )
+
+
+def _group_etag(request, slug):
+    group = _page_group(request, slug)
+    if group is None:
+        return None
+    return feed_cache.etag(
+        request, ('group', group.id), feed_cache.COMMENTS, user=True
+    )
+
+
+def _profile_etag(request, username):
+    author = _page_author(request, username)
+    if author is None:
+        return None
+    # Подписка на автора меняет версию его профиля, комментарии -
+    # счетчики карточек, а любая подписка читателя и пересчет
+    # рекомендаций - блок рекомендаций.
+    return feed_cache.etag(
+        request,
+        ('profile', author.id),
+        feed_cache.COMMENTS,
+        ('follow', request.user.id),
+        recommendations.SCOPE,
+        user=True,
+    )
+
+
+def _page_post(request, post_id):
+    return _page_object(
+        request, feeds.post_with_author_stats(), id=post_id
+    )
+
+
+def _post_etag(request, post_id):
+    post = _page_post(request, post_id)
+    if post is None:
+        return None
+    # Рядом с постом показаны счетчики автора: их меняют подписки и
+    # новые посты автора, а они меняют версию его профиля.
+    return feed_cache.etag(
+        request, ('post', post.id), ('profile', post.author_id), user=True
+    )
+
+
+@revalidate
+@condition(etag_func=_index_etag)
 def index(request):
     template = 'posts/index.html'
-    post_list = Post.objects.select_related('author', 'group')
+    post_list = feeds.index_posts()
     context = {
         'page_obj': paginator(request, post_list),
+        'cards_version': feed_cache.get_versions(feed_cache.GLOBAL)[0],
+    }
+    return render(request, template, context)
+
+
+def trending_index(request):
+    template = 'posts/trending.html'
+    context = {
+        'page_obj': Paginator(
+            feeds.trending_posts(), settings.POSTS_PER_PAGE
+        ).get_page(request.GET.get('page')),
+        'groups': feeds.trending_groups()[:settings.TRENDING_GROUPS_SHOWN],
+        'cards_version': feed_cache.get_versions(feed_cache.GLOBAL)[0],
     }
     return render(request, template, context)
 
 
+@revalidate
+@condition(etag_func=_group_etag)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.select_related('author', 'group')
+    group = _page_group(request, slug)
+    if group is None:
+        raise Http404
+    post_list = feeds.group_posts_list(group)
     context = {
         'group': group,
         'page_obj': paginator(request, post_list),
+        'cards_version': feed_cache.get_versions(feed_cache.GLOBAL)[0],
+    }
+    return render(request, template, context)
+
+
+def search_posts(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    post_ids = search.search_ids(query)
+    page_obj = Paginator(post_ids, settings.POSTS_PER_PAGE).get_page(
+        request.GET.get('page')
+    )
+    page_obj.object_list = feeds.posts_in_order(page_obj.object_list)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_prefix': urlencode({'q': query}) + '&',
+        'cards_version': feed_cache.get_versions(feed_cache.GLOBAL)[0],
     }
     return render(request, template, context)
 
 
+@revalidate
+@condition(etag_func=_profile_etag)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    follower = False
-    if request.user.is_authenticated:
-        followers = Follow.objects.filter(user=request.user, author=author)
-        follower = followers.exists()
-    post_list = author.posts.select_related('author', 'group')
+    author = _page_author(request, username)
+    if author is None:
+        raise Http404
+    follower = follow_graph.is_following(request.user.id, author.id)
+    post_list = feeds.profile_posts(author)
     context = {
         'author': author,
         'page_obj': paginator(request, post_list),
         'following': follower,
+        'recommended_authors': recommendations.recommended_authors(
+            request.user, exclude=author
+        ),
+        **feed_cache.template_versions('profile', author.id),
     }
     return render(request, template, context)
 
 
+@revalidate
+@condition(etag_func=_post_etag)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
+    post = _page_post(request, post_id)
+    if post is None:
+        raise Http404
+    comments = feeds.comments_paginator(post).get_page()
     form = CommentForm()
     context = {
         'post': post,
         'comments': comments,
         'form': form,
+        **feed_cache.template_versions('post', post.id),
+    }
+    return render(request, template, context)
+
+
+def comments_list(request, post_id):
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    page_obj = feeds.comments_paginator(post).get_page(
+        request.GET.get('after')
+    )
+    comments = [
+        {
+            'id': comment.id,
+            'author': comment.author.username,
+            'author_url': reverse(
+                'posts:profile', args=(comment.author.username,)
+            ),
+            'text': comment.text,
+            'created': comment.created.isoformat(),
+        }
+        for comment in page_obj
+    ]
+    return JsonResponse({
+        'comments': comments,
+        'next': page_obj.next_cursor,
+    })
+
+
+# Видимость ссылок в карточках постов для каждой ленты, как в
+# шаблонах самих лент.
+POST_CARDS = {
+    'index': {'link_visibility': 1, 'author_link_visibility': 1},
+    'follow': {'link_visibility': 1, 'author_link_visibility': 1},
+    'group': {'author_link_visibility': 1},
+    'profile': {'link_visibility': 1, 'author_name_none_visibility': 1},
+}
+
+
+def _cards_feed(request, feed, slug):
+    if feed == 'index':
+        return feeds.index_posts()
+    if feed == 'group':
+        return feeds.group_posts_list(get_object_or_404(Group, slug=slug))
+    if feed == 'profile':
+        return feeds.profile_posts(get_object_or_404(User, username=slug))
+    if feed == 'follow' and request.user.is_authenticated:
+        return feeds.follow_posts(request.user)
+    raise Http404
+
+
+def _post_ids(value):
+    try:
+        return [int(post_id) for post_id in value.split(',')]
+    except ValueError:
+        raise Http404
+
+
+def post_cards(request):
+    """Карточки постов ленты HTML-фрагментом.
+
+    С параметром ids - карточки новых постов ленты с этими id (их
+    сообщает new_posts_poll). Иначе - страница после курсора after для
+    бесконечной прокрутки и адрес следующего фрагмента.
+    """
+    template = 'includes/post_cards.html'
+    feed = request.GET.get('feed')
+    slug = request.GET.get('slug', '')
+    post_list = _cards_feed(request, feed, slug)
+    more_url = ''
+    if 'ids' in request.GET:
+        post_ids = _post_ids(request.GET['ids'])[:settings.POSTS_PER_PAGE]
+        page_obj = post_list.filter(id__in=post_ids).order_by(
+            '-pub_date', '-id'
+        )
+    else:
+        page_obj = CursorPaginator(
+            post_list, settings.POSTS_PER_PAGE
+        ).get_page(request.GET.get('after'))
+        if page_obj.has_next():
+            params = {'feed': feed, 'after': page_obj.next_cursor}
+            if slug:
+                params['slug'] = slug
+            more_url = f'{reverse("posts:post_cards")}?{urlencode(params)}'
+    context = {
+        'page_obj': page_obj,
+        'card': POST_CARDS[feed],
+        'more_url': more_url,
+        'cards_version': feed_cache.get_versions(feed_cache.GLOBAL)[0],
     }
     return render(request, template, context)
 
 
+def _new_posts_filter(request):
+    """Условие на (id автора, id группы) для ленты из параметра feed
+    или None, если ленты нет."""
+    feed = request.GET.get('feed', 'index')
+    if feed == 'index':
+        return lambda author_id, group_id: True
+    if feed == 'follow' and request.user.is_authenticated:
+        user_id = request.user.id
+        return lambda author_id, group_id: follow_graph.is_following(
+            user_id, author_id
+        )
+    if feed == 'group':
+        group = get_object_or_404(Group, slug=request.GET.get('slug'))
+        return lambda author_id, group_id: group_id == group.id
+    return None
+
+
+def new_posts_poll(request):
+    """Id новых постов ленты после номера события since.
+
+    Без since отдает текущий номер, с которого клиент начинает следить.
+    Ответ не ждет новых постов, а заголовок Retry-After говорит, через
+    сколько секунд спросить снова.
+    """
+    matches = _new_posts_filter(request)
+    if matches is None:
+        return JsonResponse({'detail': 'Неизвестная лента.'}, status=400)
+    try:
+        since = int(request.GET['since'])
+    except (KeyError, ValueError):
+        data = {'last': new_posts.last_number(), 'posts': [], 'reset': False}
+    else:
+        data = new_posts.poll(since, matches)
+    response = JsonResponse(data)
+    response['Retry-After'] = settings.NEW_POSTS_POLL_INTERVAL
+    return response
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     template = 'posts/create_post.html'
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -87,6 +345,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -101,36 +360,49 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    post_list = Post.objects.filter(author__following__user=request.user)
+    post_list = feeds.follow_posts(request.user)
     context = {
         'page_obj': paginator(request, post_list),
+        'recommended_authors': recommendations.recommended_authors(
+            request.user
+        ),
+        **feed_cache.template_versions('follow', request.user.id),
     }
     return render(request, template, context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     template = 'posts/follow_done.html'
     author = get_object_or_404(User, username=username)
-    if author.id != request.user.id:
-        follower = Follow.objects.filter(user=request.user, author=author)
-        if follower.exists():
-            return redirect('posts:profile', author)
-        follow = Follow(request.POST or None, user=request.user, author=author)
-        follow.save()
-        context = {
-            "author": author,
-        }
-        return render(request, template, context)
-    return redirect('posts:profile', author)
+    if author.id == request.user.id:
+        if wants_json(request):
+            return JsonResponse({'following': False}, status=400)
+        return redirect('posts:profile', author)
+    created = follow_graph.follow(request.user.id, author.id)
+    if wants_json(request):
+        return JsonResponse(
+            {'following': True}, status=201 if created else 200
+        )
+    if not created:
+        return redirect('posts:profile', author)
+    context = {
+        "author": author,
+    }
+    return render(request, template, context)
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     template = 'posts/unfollow_done.html'
     author = get_object_or_404(User, username=username)
-    follow = get_object_or_404(Follow, user=request.user, author=author)
-    follow.delete()
+    deleted = follow_graph.unfollow(request.user.id, author.id)
+    if wants_json(request):
+        return HttpResponse(status=204)
+    if not deleted:
+        return redirect('posts:profile', author)
     context = {
         "author": author,
     }
@@ -0,0 +1,41 @@
+// Подгрузка следующих комментариев на странице поста.
+document.addEventListener('DOMContentLoaded', function () {
+  var button = document.getElementById('load-comments');
+  if (!button) {
+    return;
+  }
+  var list = document.getElementById('comments');
+  button.addEventListener('click', function () {
+    button.disabled = true;
+    var url = button.dataset.url + '?after=' + encodeURIComponent(button.dataset.next);
+    fetch(url, {headers: {'Accept': 'application/json'}})
+      .then(function (response) { return response.json(); })
+      .then(function (data) {
+        data.comments.forEach(function (comment) {
+          var item = document.createElement('div');
+          item.className = 'media mb-4';
+          var body = document.createElement('div');
+          body.className = 'media-body';
+          var title = document.createElement('h5');
+          title.className = 'mt-0';
+          var link = document.createElement('a');
+          link.href = comment.author_url;
+          link.textContent = comment.author;
+          var text = document.createElement('p');
+          text.textContent = comment.text;
+          title.appendChild(link);
+          body.appendChild(title);
+          body.appendChild(text);
+          item.appendChild(body);
+          list.appendChild(item);
+        });
+        if (data.next) {
+          button.dataset.next = data.next;
+          button.disabled = false;
+        } else {
+          button.remove();
+        }
+      })
+      .catch(function () { button.disabled = false; });
+  });
+});
@@ -0,0 +1,53 @@
+// Бесконечная прокрутка ленты: следующие карточки постов догружаются
+// HTML-фрагментами, когда кнопка «Показать еще» видна на экране.
+document.addEventListener('DOMContentLoaded', function () {
+  var more = document.getElementById('more-posts');
+  if (!more) {
+    return;
+  }
+  var button = more.querySelector('button');
+  var navigation = more.parentNode.querySelector('nav[aria-label="Page navigation"]');
+  if (navigation) {
+    navigation.remove();
+  }
+  more.classList.remove('d-none');
+
+  function load() {
+    if (button.disabled) {
+      return;
+    }
+    button.disabled = true;
+    fetch(button.dataset.url)
+      .then(function (response) {
+        if (!response.ok) {
+          throw new Error(response.status);
+        }
+        return response.text();
+      })
+      .then(function (html) {
+        var fragment = document.createElement('template');
+        fragment.innerHTML = html;
+        var next = fragment.content.querySelector('[data-more-url]');
+        if (next) {
+          next.remove();
+        }
+        more.parentNode.insertBefore(fragment.content, more);
+        if (next) {
+          button.dataset.url = next.dataset.moreUrl;
+          button.disabled = false;
+        } else {
+          more.remove();
+        }
+      })
+      .catch(function () { button.disabled = false; });
+  }
+
+  button.addEventListener('click', load);
+  if ('IntersectionObserver' in window) {
+    new IntersectionObserver(function (entries) {
+      if (entries[0].isIntersecting) {
+        load();
+      }
+    }).observe(more);
+  }
+});
@@ -0,0 +1,71 @@
+// Уведомление о новых постах в открытой ленте: клиент периодически
+// спрашивает id новых постов и по кнопке догружает только их карточки.
+document.addEventListener('DOMContentLoaded', function () {
+  var banner = document.getElementById('new-posts');
+  if (!banner) {
+    return;
+  }
+  var found = [];
+  var since;
+
+  function schedule(response) {
+    var delay = parseInt(response.headers.get('Retry-After'), 10) || 30;
+    setTimeout(poll, delay * 1000);
+  }
+
+  function poll() {
+    var url = banner.dataset.pollUrl;
+    if (since !== undefined) {
+      url += '&since=' + since;
+    }
+    fetch(url, {headers: {'Accept': 'application/json'}})
+      .then(function (response) {
+        if (!response.ok) {
+          throw new Error(response.status);
+        }
+        schedule(response);
+        return response.json();
+      })
+      .then(function (data) {
+        since = data.last;
+        if (data.reset) {
+          found = null;
+          banner.textContent = 'Лента обновилась. Показать';
+          banner.classList.remove('d-none');
+          return;
+        }
+        if (found !== null && data.posts.length) {
+          found = data.posts.concat(found);
+          banner.textContent = 'Новых постов: ' + found.length + '. Показать';
+          banner.classList.remove('d-none');
+        }
+      })
+      .catch(function () { setTimeout(poll, 60000); });
+  }
+
+  banner.addEventListener('click', function () {
+    if (found === null) {
+      window.location.reload();
+      return;
+    }
+    var ids = found;
+    found = [];
+    banner.classList.add('d-none');
+    fetch(banner.dataset.cardsUrl + '&ids=' + ids.join(','))
+      .then(function (response) { return response.text(); })
+      .then(function (html) {
+        var fragment = document.createElement('template');
+        fragment.innerHTML = html;
+        var cards = fragment.content;
+        // Фрагмент начинается с разделителя, а здесь он нужен после
+        // новых карточек, перед уже показанными.
+        var separator = cards.querySelector('hr');
+        if (separator) {
+          cards.appendChild(separator);
+        }
+        banner.parentNode.insertBefore(cards, banner.nextSibling);
+      });
+  });
+
+  poll();
+});
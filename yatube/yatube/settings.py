@@ -48,10 +48,13 @@ INSTALLED_APPS = [
 
     'users.apps.UsersConfig',
     'core',
+    'api',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,6 +79,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.cache.cache_timeouts',
             ],
         },
     },
@@ -91,9 +95,46 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
     }
 }
 
+# FOR DATABASE REPLICAS
+# Реплики только для чтения. Локально их заменяют копии SQLite-файла:
+# YATUBE_SQLITE_REPLICAS=2 добавляет базы replica1 и replica2, а команда
+# sync_replicas копирует в них основную базу. В тестах реплики
+# указывают на основную базу (MIRROR).
+for number in range(1, int(os.getenv('YATUBE_SQLITE_REPLICAS', '0')) + 1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db_replica{number}.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'TEST': {'MIRROR': 'default'},
+    }
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# view-функции, которые только читают и могут читать с реплик
+REPLICA_READ_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:follow_index',
+    'api:posts',
+    'api:post_detail',
+    'api:comments',
+    'api:group_posts',
+    'api:profile_posts',
+    'api:follow_posts',
+)
+# сколько секунд после записи клиент читает из основной базы; столько же
+# реплики могут отставать, и столько же после повышения версия ленты
+# считается неустоявшейся (posts.feed_cache)
+REPLICA_STICKY_SECONDS = 15
+REPLICA_STICKY_COOKIE = 'read_primary'
+# как часто проверять, что реплика отвечает
+REPLICA_HEALTH_CHECK_INTERVAL = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -142,11 +183,109 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 # CACH
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Версии лент, журналы популярного и новых постов должны быть общими
+# для всех воркеров сайта и команд из cron: YATUBE_MEMCACHED (адреса
+# серверов через запятую, нужен пакет python-memcached) включает
+# memcached. Без него кэш живет в памяти процесса (разработка и тесты).
+MEMCACHED = os.getenv('YATUBE_MEMCACHED')
+if MEMCACHED:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': MEMCACHED.split(','),
+        }
     }
-}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+# фрагменты лент и версии лент; ключи сбрасываются сигналами в
+# posts.signals, поэтому общий кэш можно хранить долго. В кэше процесса
+# сброс виден только этому процессу, и остальные увидят изменения
+# через FEED_CACHE_TTL.
+FEED_CACHE_TTL = 60 * 60 * 3 if MEMCACHED else 60
+# версии лент в общем кэше хранятся без срока
+FEED_VERSION_TTL = None if MEMCACHED else FEED_CACHE_TTL
+# карточка поста, ключ меняется вместе с Post.updated
+POST_CARD_CACHE_TTL = 60 * 60 * 24
 
 # FOR PAGINATOR
 POSTS_PER_PAGE = 10
+# 'offset' - номера страниц, 'cursor' - переход по ключу (pub_date, id)
+POSTS_PAGINATION = 'offset'
+# кнопка «Показать еще», догружающая карточки постов без перехода
+# на следующую страницу
+POSTS_INFINITE_SCROLL = True
+# комментарии на странице поста, остальные подгружаются по курсору
+COMMENTS_PER_PAGE = 20
+
+# FOR NEW POSTS NOTIFICATIONS
+# через сколько секунд клиент снова спрашивает о новых постах;
+# сколько событий журнал хранит и как долго
+NEW_POSTS_POLL_INTERVAL = 30
+NEW_POSTS_BACKLOG = 1000
+# отсутствующее событие среди последних номеров еще записывается,
+# более старое - потеряно и пропускается
+NEW_POSTS_PENDING = 10
+NEW_POSTS_TTL = 60 * 60
+
+# FOR API
+# наибольший размер страницы, который клиент может запросить limit
+API_MAX_PAGE_SIZE = 100
+
+# FOR REQUEST METRICS
+# заголовок Server-Timing и гистограммы по view-функциям (/metrics/)
+REQUEST_METRICS = True
+# запросы с большим числом SQL-запросов пишутся в лог core.middleware
+REQUEST_METRICS_QUERY_LIMIT = 30
+
+# FOR FOLLOW GRAPH
+# сколько множеств подписок пользователей хранит каждый процесс
+FOLLOW_GRAPH_CACHE_SIZE = 10000
+
+# FOR RECOMMENDATIONS
+# сколько рекомендаций хранится и сколько показывается пользователю
+RECOMMENDATIONS_TOP_K = 20
+RECOMMENDATIONS_SHOWN = 5
+# слишком популярные авторы не используются для поиска похожих читателей
+RECOMMENDATIONS_MAX_FOLLOWERS = 5000
+
+# FOR TRENDING
+# журнал комментариев в кэше: интервалы по 5 минут за последние сутки
+TRENDING_SLOT_SECONDS = 5 * 60
+TRENDING_WINDOW_SLOTS = 24 * 12
+# за сколько секунд вес комментария уменьшается вдвое
+TRENDING_HALF_LIFE = 60 * 60 * 3
+# сколько постов и групп сохраняет materialize_trending
+TRENDING_SIZE = 100
+TRENDING_GROUPS_SHOWN = 10
+
+# FOR SEARCH
+# реализация поискового индекса постов
+POSTS_SEARCH_BACKEND = 'posts.search.SQLiteFTSBackend'
+# сколько самых релевантных постов показывает поиск
+SEARCH_RESULTS_LIMIT = 500
+
+# FOR THUMBNAILS
+# ширины миниатюр постов для srcset, создаются фоновыми воркерами
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+# пропорции карточки: высота миниатюры считается от ширины
+POST_IMAGE_RATIO = (960, 339)
+POST_IMAGE_OPTIONS = {'crop': 'center', 'upscale': True}
+# современные форматы в порядке предпочтения; используются, только если
+# их умеют сохранять Pillow и sorl-thumbnail, JPEG создается всегда
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP')
+# атрибут sizes: ширина карточки в колонке bootstrap
+POST_IMAGE_SIZES = '(min-width: 1200px) 1110px, 100vw'
+# число процессов генерации; 0 - фоновый поток текущего процесса
+THUMBNAIL_WORKERS = 0
+
+# FOR FOLLOW TIMELINE
+# сколько последних записей хранится в ленте подписок пользователя
+TIMELINE_LENGTH = 800
+# авторы с большим числом подписчиков подмешиваются в ленту при чтении
+TIMELINE_FANOUT_LIMIT = 5000
+TIMELINE_BATCH_SIZE = 500